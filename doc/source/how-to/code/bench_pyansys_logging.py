@@ -0,0 +1,896 @@
+"""Benchmarks for PyAnsys logging.
+
+Run the benchmarks from this directory:
+
+.. code:: bash
+
+   python bench_pyansys_logging.py
+
+Save the results in a JSON file, and compare a later run against it to catch
+performance regressions:
+
+.. code:: bash
+
+   python bench_pyansys_logging.py --output baseline.json
+   python bench_pyansys_logging.py --baseline baseline.json
+
+The comparison fails when a case is slower than its baseline by more than
+the tolerance.
+"""
+
+import argparse
+import asyncio
+from contextlib import ExitStack, contextmanager, redirect_stdout
+import gc
+import json
+import logging
+import logging.handlers
+import os
+from pathlib import Path
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import pyansys_logging
+
+
+class LegacyPercentStyle(logging.PercentStyle):
+    """Previous formatting style, merging a dictionary for every record."""
+
+    def __init__(self, fmt, *, defaults=None):
+        self._fmt = fmt or self.default_format
+        self._defaults = defaults
+
+    def _format(self, record):
+        defaults = self._defaults
+        if defaults:
+            values = defaults | record.__dict__
+        else:
+            values = record.__dict__
+        values.setdefault("instance_name", "")
+        return pyansys_logging.STDOUT_MSG_FORMAT % values
+
+
+class LegacyFormatter(logging.Formatter):
+    """Previous ``PyProjectFormatter``, formatting the record for every handler."""
+
+    def __init__(self, fmt=pyansys_logging.STDOUT_MSG_FORMAT):
+        super().__init__(fmt)
+        self._style = LegacyPercentStyle(fmt)
+
+
+def make_record(message="Solver iteration %d converged", args=(42,)):
+    """Create a record like the ones sent by an instance logger."""
+    record = logging.LogRecord(
+        "pyproject_global", logging.DEBUG, __file__, 10, message, args, None, "solve"
+    )
+    record.instance_name = "127.0.0.1:50052"
+    return record
+
+
+def records_per_second(func, number):
+    """Call ``func`` with a fresh record ``number`` times and return the rate."""
+    records = [make_record() for _ in range(number)]
+    start = time.perf_counter()
+    for record in records:
+        func(record)
+    return number / (time.perf_counter() - start)
+
+
+def bench_formatter(number=200_000):
+    """Compare the legacy and precompiled formatters.
+
+    The two-handler case formats each record for the standard output and
+    the file handlers, which share the same format.
+    """
+    legacy = LegacyFormatter()
+    legacy_file = LegacyFormatter()
+    fast = pyansys_logging.PyProjectFormatter()
+    fast_file = pyansys_logging.PyProjectFormatter(pyansys_logging.FILE_MSG_FORMAT)
+
+    def legacy_both(record):
+        legacy.format(record)
+        legacy_file.format(record)
+
+    def fast_both(record):
+        fast.format(record)
+        fast_file.format(record)
+
+    return {
+        "legacy, one handler": records_per_second(legacy.format, number),
+        "precompiled, one handler": records_per_second(fast.format, number),
+        "legacy, two handlers": records_per_second(legacy_both, number),
+        "precompiled, two handlers": records_per_second(fast_both, number),
+    }
+
+
+def measure(call, number, threads=1):
+    """Call ``call`` ``number`` times in total from ``threads`` threads.
+
+    Returns
+    -------
+    dict
+        Total rate in records per second, and median and 99th percentile
+        latency of a call in microseconds.
+    """
+    per_thread = number // threads
+    latencies = []
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        timings = [0] * per_thread
+        clock = time.perf_counter_ns
+        barrier.wait()
+        for index in range(per_thread):
+            start = clock()
+            call("Solver iteration %d converged", index)
+            timings[index] = clock() - start
+        latencies.extend(timings)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for each in workers:
+        each.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for each in workers:
+        each.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "records_per_second": len(latencies) / elapsed,
+        "p50_us": latencies[len(latencies) // 2] / 1000,
+        "p99_us": latencies[len(latencies) * 99 // 100] / 1000,
+    }
+
+
+@contextmanager
+def session(
+    to_stdout=False, to_file=False, level=logging.DEBUG, asynchronous=False, compact_records=False
+):
+    """Create a ``Logger`` writing to a null standard output and a temporary file."""
+    excepthook = sys.excepthook
+    with tempfile.TemporaryDirectory() as directory, Path(os.devnull).open("w") as null:
+        # A file name other than the default adds a file handler.
+        files = {"filename": str(Path(directory) / "bench.log")} if to_file else {}
+        with redirect_stdout(null):
+            logger = pyansys_logging.Logger(
+                level=level,
+                to_file=to_file,
+                to_stdout=to_stdout,
+                cleanup=False,
+                asynchronous=asynchronous,
+                compact_records=compact_records,
+                **files,
+            )
+            try:
+                yield logger
+            finally:
+                for handler in list(logger.logger.handlers):
+                    handler.close()
+                    logger.logger.removeHandler(handler)
+                sys.excepthook = excepthook
+
+
+class ProductInstance:
+    """Product instance with a name, for the instance loggers."""
+
+    def __init__(self, name="127.0.0.1:50052"):
+        self.name = name
+
+    def get_name(self):
+        """Return the name of the instance."""
+        return self.name
+
+
+THREADS = (1, 8, 64)
+
+
+def bench_handlers(number=64_000):
+    """Measure the handler path of ``Logger`` and its child and instance loggers."""
+    cases = {
+        "stdout": {"to_stdout": True},
+        "file": {"to_file": True},
+        "stdout and file": {"to_stdout": True, "to_file": True},
+    }
+    results = {}
+    for threads in THREADS:
+        suffix = f"{threads} thread{'s' if threads > 1 else ''}"
+        for case, kwargs in cases.items():
+            with session(**kwargs) as logger:
+                results[f"{case}, {suffix}"] = measure(logger.info, number, threads)
+
+        with session(to_file=True) as logger:
+            instance = logger.add_instance_logger("bench", ProductInstance())
+            results[f"instance logger, {suffix}"] = measure(instance.info, number, threads)
+
+        with session(to_file=True) as logger:
+            child = logger.add_child_logger("bench")
+            results[f"child logger, {suffix}"] = measure(child.info, number, threads)
+
+        with session(to_file=True, level=logging.INFO) as logger:
+            results[f"disabled level, {suffix}"] = measure(logger.debug, number * 10, threads)
+    return results
+
+
+# Round trip of a flush on a network file system, in seconds.
+NETWORK_DELAY = 0.0002
+
+
+class SlowStream:
+    """File stream waiting ``delay`` seconds on each flush, like a network file system."""
+
+    def __init__(self, stream, delay):
+        self._stream = stream
+        self._delay = delay
+
+    def write(self, text):
+        """Write the text to the file."""
+        return self._stream.write(text)
+
+    def flush(self):
+        """Wait, then flush the file."""
+        time.sleep(self._delay)
+        self._stream.flush()
+
+    def close(self):
+        """Close the file."""
+        self._stream.close()
+
+
+def slow_open(open_stream, delay):
+    """Wrap the ``_open`` method of a file handler to return a :class:`SlowStream`."""
+
+    def _open():
+        return SlowStream(open_stream(), delay)
+
+    return _open
+
+
+class LoopStallMonitor:
+    """Measure how late the event loop wakes up a sleeping task.
+
+    The delay of each wake-up is the time the loop spent running other
+    callbacks, such as synchronous log calls, when the task was due.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stalls = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.stalls.append(loop.time() - due)
+
+    async def __aenter__(self):
+        """Start the monitoring task."""
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Stop the monitoring task."""
+        self._task.cancel()
+
+
+def bench_asyncio(number=20_000, tasks=100):
+    """Measure the event loop stalls of synchronous and asynchronous logging.
+
+    ``tasks`` coroutines log ``number`` records in total to the standard
+    output and a file, local or with the latency of a network file system.
+    The latencies are the delays of the event loop measured by
+    :class:`LoopStallMonitor`.
+    """
+
+    async def log_from_tasks(logger):
+        async def task():
+            for index in range(number // tasks):
+                logger.info("Solver iteration %d converged", index)
+                await asyncio.sleep(0)
+
+        async with LoopStallMonitor() as monitor:
+            start = time.perf_counter()
+            await asyncio.gather(*(task() for _ in range(tasks)))
+            elapsed = time.perf_counter() - start
+        await logger.drain()
+        stalls = sorted(monitor.stalls) or [0.0]
+        return {
+            "records_per_second": number / elapsed,
+            "p50_us": stalls[len(stalls) // 2] * 1e6,
+            "p99_us": stalls[len(stalls) * 99 // 100] * 1e6,
+        }
+
+    results = {}
+    for storage, delay in (("local file", 0), ("network file", NETWORK_DELAY)):
+        for mode, asynchronous in (("synchronous", False), ("asynchronous", True)):
+            with session(to_stdout=True, to_file=True, asynchronous=asynchronous) as logger:
+                if delay:
+                    for handler in pyansys_logging._iter_handlers(logger.logger.handlers):
+                        if isinstance(handler, logging.FileHandler):
+                            # The file is opened with the first record.
+                            handler._open = slow_open(handler._open, delay)
+                results[f"{mode}, {storage}"] = asyncio.run(log_from_tasks(logger))
+    return results
+
+
+def bench_levels(number=2_000, loggers=5_000):
+    """Measure level changes and checks with ``loggers`` live instance loggers."""
+    results = {}
+    with session(to_file=True, level=logging.INFO) as logger:
+        product = ProductInstance()
+        instances = [logger.add_instance_logger("bench", product) for _ in range(loggers)]
+        levels = [logging.DEBUG, logging.INFO] * (number // 2)
+
+        start = time.perf_counter()
+        for level in levels:
+            logger.setLevel(level)
+            instances[-1].debug("Checked after a level change")
+        results[f"level change and check, {loggers} loggers"] = {
+            "records_per_second": number / (time.perf_counter() - start)
+        }
+
+        logger.setLevel(logging.INFO)
+        results[f"disabled level, {loggers} loggers"] = measure(instances[-1].debug, number * 100)
+        del instances
+    return results
+
+
+def bench_files(number=200_000):
+    """Compare the file backends writing ``DEBUG`` records of an instance logger."""
+    backends = {
+        "file": {},
+        "buffered file": {"buffer_size": pyansys_logging.BUFFER_SIZE},
+        "mapped segments": {"segment_size": pyansys_logging.SEGMENT_SIZE},
+    }
+    results = {}
+    for case, options in backends.items():
+        with session() as logger, tempfile.TemporaryDirectory() as directory:
+            pyansys_logging.add_file_handler(logger, str(Path(directory) / "bench.log"), **options)
+            instance = logger.add_instance_logger("bench", ProductInstance())
+            results[case] = measure(instance.debug, number)
+            for handler in list(logger.logger.handlers):
+                handler.close()
+                logger.logger.removeHandler(handler)
+    return results
+
+
+class RecordKeeper(logging.Handler):
+    """Handler keeping the records, to measure their memory."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        """Keep the record."""
+        self.records.append(record)
+
+
+def bench_records(number=100_000, kept=10_000):
+    """Compare standard and compact records of instance logger calls.
+
+    The rates are measured with a file handler. The memory is the size
+    of ``kept`` records held by a handler, measured with ``tracemalloc``.
+    """
+    results = {}
+    for kind, compact in (("standard", False), ("compact", True)):
+        with session(to_file=True, compact_records=compact) as logger:
+            instance = logger.add_instance_logger("bench", ProductInstance())
+            result = measure(instance.debug, number)
+
+            keeper = RecordKeeper()
+            logger.logger.addHandler(keeper)
+            tracemalloc.start()
+            for index in range(kept):
+                instance.debug("Solver iteration %d converged", index)
+            result["bytes_per_record"] = tracemalloc.get_traced_memory()[0] / kept
+            tracemalloc.stop()
+            logger.logger.removeHandler(keeper)
+            results[f"{kind} records"] = result
+    return results
+
+
+def bench_ingestion(number=200_000, chunk_size=64 * 1024):
+    """Compare logging a product log line by line and with ``ingest``.
+
+    The log of ``number`` records is received in chunks of ``chunk_size``
+    bytes, and written to a file.
+    """
+    data = "".join(
+        f"{('INFO', 'WARNING', 'DEBUG')[index % 3]}: Solver iteration {index} converged\n"
+        for index in range(number)
+    ).encode()
+    chunks = [data[start : start + chunk_size] for start in range(0, len(data), chunk_size)]
+
+    def line_by_line(instance):
+        pending = b""
+        for chunk in chunks:
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                level, message = line.decode().split(": ", 1)
+                instance.log(pyansys_logging.string_to_loglevel[level], message)
+
+    results = {}
+    for case, call in (
+        ("line by line", line_by_line),
+        ("ingest", lambda each: each.ingest(chunks)),
+    ):
+        with session(to_file=True) as logger:
+            instance = logger.add_instance_logger("bench", ProductInstance())
+            start = time.perf_counter()
+            call(instance)
+            results[case] = {"records_per_second": number / (time.perf_counter() - start)}
+    return results
+
+
+def drain(server, received):
+    """Accept connections on ``server`` and count the bytes they receive in ``received``."""
+
+    def receive(connection):
+        with connection:
+            while data := connection.recv(1024 * 1024):
+                received[0] += len(data)
+
+    while True:
+        try:
+            connection, _ = server.accept()
+        except OSError:
+            return
+        threading.Thread(target=receive, args=(connection,), daemon=True).start()
+
+
+def bench_network(number=100_000):
+    """Compare shipping the records of an instance logger to a local collector.
+
+    The collector discards what it receives, after counting the bytes. The
+    rate includes sending the last records when the handler is closed.
+    """
+    server = socket.create_server(("127.0.0.1", 0))
+    received = [0]
+    threading.Thread(target=drain, args=(server, received), daemon=True).start()
+    address = server.getsockname()
+    cases = {
+        "socket handler": lambda: logging.handlers.SocketHandler(*address),
+        "network handler": lambda: pyansys_logging.PyAnsysNetworkHandler(address),
+        "network handler, uncompressed": lambda: pyansys_logging.PyAnsysNetworkHandler(
+            address, compress=False
+        ),
+    }
+    results = {}
+    for case, make_handler in cases.items():
+        with session() as logger:
+            handler = make_handler()
+            logger.logger.addHandler(handler)
+            instance = logger.add_instance_logger("bench", ProductInstance())
+            received[0] = 0
+            start = time.perf_counter()
+            result = measure(instance.debug, number)
+            handler.close()
+            result["records_per_second"] = number / (time.perf_counter() - start)
+            # The collector may still be reading the last bytes.
+            time.sleep(0.1)
+            result["bytes_per_record"] = received[0] / number
+            results[case] = result
+    server.close()
+    return results
+
+
+def calls_per_second(call, number):
+    """Call ``call`` ``number`` times in the current thread and return the rate."""
+    start = time.perf_counter()
+    for index in range(number):
+        call("Solver iteration %d converged", index)
+    return {"records_per_second": number / (time.perf_counter() - start)}
+
+
+def bench_context(number=100_000, sessions=2_000):
+    """Compare attributing records with instance loggers and with ``log_context``.
+
+    The calls are measured in the current thread, where the context is set.
+    Each new session logs one record, and its memory is measured with
+    ``tracemalloc`` while ``sessions`` sessions are live.
+    """
+    results = {}
+    with session(to_file=True) as logger:
+        instance = logger.add_instance_logger("bench", ProductInstance())
+        results["instance logger"] = calls_per_second(instance.debug, number)
+        with pyansys_logging.log_context("bench"):
+            results["log context"] = calls_per_second(logger.debug, number)
+        with pyansys_logging.log_context("bench", session_id=1):
+            results["log context with a field"] = calls_per_second(logger.debug, number)
+        del instance
+
+        def instance_session(stack, index):
+            instance = logger.add_instance_logger("bench", ProductInstance())
+            instance.debug("Session %d started", index)
+            return instance
+
+        def context_session(stack, index):
+            stack.enter_context(pyansys_logging.log_context("bench", session_id=index))
+            logger.debug("Session %d started", index)
+
+        for case, new_session in (
+            ("instance logger, new session", instance_session),
+            ("log context, new session", context_session),
+        ):
+            with ExitStack() as stack:
+                tracemalloc.start()
+                start = time.perf_counter()
+                live = [new_session(stack, index) for index in range(sessions)]
+                elapsed = time.perf_counter() - start
+                size = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                del live
+            results[case] = {
+                "records_per_second": sessions / elapsed,
+                "bytes_per_record": size / sessions,
+            }
+    return results
+
+
+# Stress records, checked for loss, tearing, and attribution. The instance
+# name is empty for the records of the child loggers.
+STRESS_LINE = re.compile(
+    r"[A-Z]+ - (?P<instance>\S*) - \S+ - \S+ - "
+    r"stress (?P<source>\S+) (?P<number>\d+) (?P<size>\d+) (?P<body>x*)"
+)
+# Minimum rate with the most threads, as a fraction of the rate with one.
+STRESS_SCALING = 0.5
+
+
+def stress_thread(logger, source, records, churn):
+    """Log ``records`` records as ``source``, with a new instance logger every ``churn`` records.
+
+    The records are logged in turn by the instance logger, by the global
+    logger in a ``log_context``, and by a child logger.
+    """
+    child = logger.add_child_logger(f"stress_{source}")
+    instance = None
+    for number in range(records):
+        if number % churn == 0:
+            # The previous instance logger is collected and its name released.
+            instance = logger.add_instance_logger(source, ProductInstance(source))
+        body = "x" * (number % 200)
+        kind = number % 3
+        if kind == 0:
+            instance.info("stress %s %d %d %s", source, number, len(body), body)
+        elif kind == 1:
+            with pyansys_logging.log_context(source):
+                logger.info("stress %s %d %d %s", source, number, len(body), body)
+        else:
+            child.info("stress %s %d %d %s", source, number, len(body), body)
+
+
+def run_stress_threads(logger, prefix, threads, records, churn):
+    """Run ``threads`` threads of :func:`stress_thread` and return their sources."""
+    sources = [f"{prefix}t{index}" for index in range(threads)]
+    workers = [
+        threading.Thread(target=stress_thread, args=(logger, source, records, churn))
+        for source in sources
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sources
+
+
+def stress_process(index, threads, records, churn):
+    """Run the stress threads in a worker process set up by ``worker_initializer``."""
+    logger = pyansys_logging.Logger(to_stdout=False)
+    return run_stress_threads(logger, f"p{index}", threads, records, churn)
+
+
+def open_descriptors():
+    """Return the number of open file descriptors, or ``None`` if unknown."""
+    try:
+        return len(list(Path("/proc/self/fd").iterdir()))
+    except OSError:
+        return None
+
+
+def stress(threads=8, processes=0, records=2_000, churn=50):
+    """Log from many threads and processes creating and releasing instance loggers.
+
+    Each of the ``threads`` threads, in this process and in each of the
+    ``processes`` worker processes, logs ``records`` records to a file. The
+    rate includes starting the worker processes.
+
+    Returns
+    -------
+    dict
+        Rate in records per second, and the number of records lost,
+        duplicated, torn or interleaved, and attributed to the wrong
+        instance, as well as the leaked instance loggers, handlers, file
+        descriptors, and threads, all expected to be zero.
+    """
+    if processes:
+        from multiprocessing import resource_tracker
+
+        # Started with the first spawned process, and kept open afterwards.
+        resource_tracker.ensure_running()
+    gc.collect()
+    descriptors = open_descriptors()
+    thread_count = threading.active_count()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = str(Path(directory) / "stress.log")
+        logger = pyansys_logging.Logger(to_file=True, to_stdout=False, filename=filename)
+        handlers = list(logger.logger.handlers)
+        start = time.perf_counter()
+        pool = None
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor
+            import multiprocessing
+
+            listener = logger.start_process_listener()
+            # Workers are spawned, as the threads of this process can hold
+            # locks when it forks.
+            pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=pyansys_logging.worker_initializer,
+                initargs=listener.initargs,
+            )
+            futures = [
+                pool.submit(stress_process, index, threads, records, churn)
+                for index in range(processes)
+            ]
+        sources = run_stress_threads(logger, "", threads, records, churn)
+        if pool is not None:
+            for future in futures:
+                sources += future.result()
+            pool.shutdown()
+            listener.stop()
+        elapsed = time.perf_counter() - start
+
+        gc.collect()
+        names = set(sources)
+        leaked_loggers = sum(name.split("_")[0] in names for name in logger._instances)
+        leaked_handlers = (
+            len(logger.logger.handlers)
+            - len(handlers)
+            + sum(name.split("_")[0] in names for name in logger.shared_handler.levels)
+        )
+        logger.file_handler.flush()
+        lines = Path(filename).read_text(encoding="utf-8").splitlines()
+        for source in sources:
+            child = pyansys_logging._get_logger(f"pyproject_global.stress_{source}")
+            child.removeHandler(logger.shared_handler)
+        del logger
+        gc.collect()
+
+    seen = {}
+    torn = misattributed = 0
+    for line in lines:
+        if "stress" not in line:
+            continue
+        match = STRESS_LINE.fullmatch(line)
+        if match is None or int(match["size"]) != len(match["body"]):
+            torn += 1
+            continue
+        key = (match["source"], int(match["number"]))
+        seen[key] = seen.get(key, 0) + 1
+        expected = "" if key[1] % 3 == 2 else key[0]
+        misattributed += match["instance"] != expected
+    total = len(sources) * records
+    after = open_descriptors()
+    return {
+        "records_per_second": total / elapsed,
+        "lost": sum(
+            (source, number) not in seen for source in sources for number in range(records)
+        ),
+        "duplicated": sum(count - 1 for count in seen.values()),
+        "torn": torn,
+        "misattributed": misattributed,
+        "leaked_loggers": leaked_loggers,
+        "leaked_handlers": leaked_handlers,
+        "leaked_descriptors": 0 if descriptors is None else after - descriptors,
+        "leaked_threads": threading.active_count() - thread_count,
+    }
+
+
+def stress_errors(result):
+    """Return the correctness counters of a :func:`stress` result that are not zero."""
+    return {key: value for key, value in result.items() if key != "records_per_second" and value}
+
+
+def bench_stress(records=2_000, thread_counts=(1, 4, 16), processes=4):
+    """Measure the stress harness, and fail if it loses records or leaks resources.
+
+    Raises
+    ------
+    AssertionError
+        If records are lost, torn, duplicated, or misattributed, if
+        resources leak, or if the rate with the most threads is lower than
+        ``STRESS_SCALING`` times the rate with one thread.
+    """
+    results = {}
+    for threads in thread_counts:
+        results[f"threads: {threads}"] = stress(threads, records=records)
+    results[f"processes: {processes}, threads: 4"] = stress(4, processes, records=records)
+    for case, result in results.items():
+        errors = stress_errors(result)
+        if errors:
+            raise AssertionError(f"Stress with {case}: {errors}")
+    rates = [results[f"threads: {threads}"]["records_per_second"] for threads in thread_counts]
+    if rates[-1] < STRESS_SCALING * rates[0]:
+        raise AssertionError(
+            f"{thread_counts[-1]} threads log at {rates[-1] / rates[0]:.0%} of the rate of one."
+        )
+    return results
+
+
+# Timed in a new interpreter: import, session start, and first record.
+STARTUP_SCRIPT = """
+import json
+import tempfile
+import time
+
+with tempfile.TemporaryDirectory() as directory:
+    filename = directory + "/bench.log"
+    start = time.perf_counter()
+    import pyansys_logging
+
+    imported = time.perf_counter()
+    logger = pyansys_logging.Logger(to_file=True, to_stdout=False, filename=filename)
+    started = time.perf_counter()
+    if {log}:
+        logger.info("First record")
+    logged = time.perf_counter()
+    del logger
+print(json.dumps([imported - start, started - imported, logged - started]))
+"""
+
+
+def bench_startup(runs=20):
+    """Measure the import, the session start, and the first record in new interpreters.
+
+    A rate is the number of such operations per second, and the latencies
+    are the distribution over ``runs`` interpreters. The cost of a session
+    without records, like a short command that logs nothing, is measured
+    with the whole interpreter.
+    """
+
+    def run_script(log):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT.format(log=log)],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return [*json.loads(output), time.perf_counter() - start]
+
+    def summarize(durations):
+        durations = sorted(durations)
+        return {
+            "records_per_second": len(durations) / sum(durations),
+            "p50_us": durations[len(durations) // 2] * 1e6,
+            "p99_us": durations[len(durations) * 99 // 100] * 1e6,
+        }
+
+    logged = [run_script(log=True) for _ in range(runs)]
+    silent = [run_script(log=False) for _ in range(runs)]
+    return {
+        "import": summarize([each[0] for each in logged]),
+        "session start": summarize([each[1] for each in logged]),
+        "first record": summarize([each[2] for each in logged]),
+        "process without records": summarize([each[3] for each in silent]),
+    }
+
+
+BENCHMARKS = {
+    "formatter": bench_formatter,
+    "handlers": bench_handlers,
+    "levels": bench_levels,
+    "asyncio": bench_asyncio,
+    "files": bench_files,
+    "startup": bench_startup,
+    "records": bench_records,
+    "ingestion": bench_ingestion,
+    "network": bench_network,
+    "context": bench_context,
+    "stress": bench_stress,
+}
+
+
+def run(names):
+    """Run the benchmarks in ``names``, or all of them.
+
+    Returns
+    -------
+    dict
+        Results of each case of each benchmark. A result is a dictionary
+        with at least a ``records_per_second`` entry.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = {}
+        for case, result in BENCHMARKS[name]().items():
+            if not isinstance(result, dict):
+                result = {"records_per_second": result}
+            results[name][case] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the cases slower than their baseline by more than ``tolerance``.
+
+    A case is slower when its rate is lower, or its median latency higher,
+    than the baseline by more than the ``tolerance`` fraction.
+    """
+    regressions = []
+    for name, cases in results.items():
+        for case, result in cases.items():
+            reference = baseline.get(name, {}).get(case)
+            if reference is None:
+                continue
+            rate = result["records_per_second"] / reference["records_per_second"]
+            if rate < 1 - tolerance:
+                regressions.append(f"{name}, {case}: {rate:.0%} of the baseline rate")
+            if "p50_us" in result and "p50_us" in reference:
+                latency = result["p50_us"] / reference["p50_us"]
+                if latency > 1 + tolerance:
+                    regressions.append(f"{name}, {case}: {latency:.0%} of the baseline latency")
+    return regressions
+
+
+def print_results(results):
+    """Print the results in a table."""
+    for name, cases in results.items():
+        print(f"{name}:")
+        for case, result in cases.items():
+            line = f"    {case:<40} {result['records_per_second']:>12,.0f} records/s"
+            if "p50_us" in result:
+                line += f" {result['p50_us']:>9.2f} us p50 {result['p99_us']:>9.2f} us p99"
+            if "bytes_per_record" in result:
+                line += f" {result['bytes_per_record']:>7.0f} B/record"
+            print(line)
+
+
+def main(argv=None):
+    """Run the benchmarks, save the results, and compare them to a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "names", nargs="*", help=f"benchmarks to run, among {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument("--output", help="JSON file where the results are saved")
+    parser.add_argument("--baseline", help="JSON file with the results to compare to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="slowdown allowed compared to the baseline, by default 0.2",
+    )
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}'")
+
+    results = run(args.names)
+    print_results(results)
+    if args.output:
+        document = {"python": platform.python_version(), "results": results}
+        Path(args.output).write_text(json.dumps(document, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
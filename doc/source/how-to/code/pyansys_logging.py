@@ -1,15 +1,77 @@
 """Module for PyAnsys logging."""
 
-from copy import copy
-from datetime import datetime
+import atexit
+import collections
+from collections.abc import Mapping
+from contextlib import contextmanager
+import contextvars
+import functools
+import itertools
 import logging
 from logging import CRITICAL, DEBUG, ERROR, INFO, WARN
+import operator
+from operator import attrgetter, itemgetter
+import os
+import queue
+import re
+import struct
 import sys
+import threading
+import time
+import traceback
+import weakref
+import zlib
 
 # Default configuration
 LOG_LEVEL = logging.DEBUG
 FILE_NAME = "PyProject.log"
 
+# Asynchronous logging
+QUEUE_SIZE = 10000
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_new")
+
+# Rotation: module providing ``open`` and extension of the compressed segments
+COMPRESSIONS = {"gzip": ".gz", "bz2": ".bz2", "lzma": ".xz"}
+
+# Structured output
+FILE_FORMATS = ("text", "jsonl", "binary")
+BINARY_MAGIC = b"PYALOG\x00\x01"
+# Frame: size of the rest of the frame, kind, level, timestamp, and the sizes
+# of the instance name, module, function, and message that follow it.
+_BINARY_FRAME = struct.Struct("<IBBdHHHI")
+_RECORD_FRAME = 0
+_SESSION_FRAME = 1
+
+# Buffered writes
+BUFFER_SIZE = 64 * 1024
+FSYNC_POLICIES = ("never", "periodic", "flush")
+
+# Index: sidecar file mapping sessions and records to byte offsets
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"PYAIDX\x00\x02"
+# Entry: offset, timestamp, latest timestamp of the entries up to this one,
+# kind, level, and hash of the instance name. Records can be written after
+# newer ones, but the latest timestamps never decrease, so they are searched
+# by bisection.
+_INDEX_ENTRY = struct.Struct("<QddBBxxI")
+
+# Memory-mapped segments: preallocated size, and header with the end of the
+# written data, which readers follow without locks
+SEGMENT_SIZE = 16 * 1024 * 1024
+SEGMENT_MAGIC = b"PYASEG\x00\x01"
+_SEGMENT_HEADER = struct.Struct("<8sQ")
+_SEGMENT_END = struct.Struct("<Q")
+_SEGMENT_SUFFIX = r"\.(\d{6})"
+
+# Flight recorder: records kept in memory for each ring
+FLIGHT_RECORDER_CAPACITY = 1000
+
+# Network shipping: batches waiting for the senders, and frame header with
+# the payload size, the batch number, and the flags
+SHIP_MAX_BATCHES = 64
+_SHIP_FRAME = struct.Struct("<IQB")
+_SHIP_COMPRESSED = 1
+
 
 # Formatting
 STDOUT_MSG_FORMAT = "%(levelname)s - %(instance_name)s - %(module)s - %(funcName)s - %(message)s"
@@ -20,11 +82,25 @@ LEVEL - INSTANCE NAME - MODULE - FUNCTION - MESSAGE
 """
 DEFAULT_FILE_HEADER = DEFAULT_STDOUT_HEADER
 
-NEW_SESSION_HEADER = f"""
+_SESSION_HEADER_FORMAT = """
 ===============================================================================
-       NEW SESSION - {datetime.now().strftime("%m/%d/%Y, %H:%M:%S")}
+       NEW SESSION - %m/%d/%Y, %H:%M:%S
 ==============================================================================="""
 
+
+def new_session_header():
+    """Return the header of a session starting now."""
+    return time.strftime(_SESSION_HEADER_FORMAT)
+
+
+def __getattr__(name):
+    # ``NEW_SESSION_HEADER`` is computed when it is read, so its time is the
+    # one of the session using it and not the one of the import.
+    if name == "NEW_SESSION_HEADER":
+        return new_session_header()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 string_to_loglevel = {
     "DEBUG": DEBUG,
     "INFO": INFO,
@@ -35,6 +111,319 @@ string_to_loglevel = {
 }
 
 
+# Changed by every level change of a ``PyAnsysLogger``. Each logger keeps
+# its threshold for the current generation only. The generations come from
+# a counter, so concurrent level changes never publish the same one.
+_level_generations = itertools.count()
+_level_generation = next(_level_generations)
+
+
+class CompactLogRecord:
+    """Log record without a dictionary for each instance.
+
+    The loggers of a ``Logger`` created with ``compact_records=True`` create
+    these records instead of ``logging.LogRecord`` objects. Only the
+    attributes used by the formats, filters, and handlers of this module are
+    stored. The level name, file name, module, and the times derived from
+    ``created`` are computed when read. The thread and process names are not
+    kept.
+
+    The attributes cannot be extended, so a record with other ``extra``
+    or :func:`log_context` fields than ``instance_name`` is created as a
+    standard record. The
+    ``__dict__`` attribute returns a new dictionary of all the attributes,
+    for formatters reading it.
+    """
+
+    __slots__ = (
+        "name",
+        "msg",
+        "args",
+        "levelno",
+        "pathname",
+        "lineno",
+        "funcName",
+        "created",
+        "exc_info",
+        "exc_text",
+        "stack_info",
+        "thread",
+        "instance_name",
+        "message",
+        "asctime",
+        "__weakref__",  # For the output cache of ``PyProjectFormatter``.
+    )
+
+    threadName = None
+    processName = None
+    taskName = None
+
+    def __init__(self, name, level, pathname, lineno, msg, args, exc_info, func=None, sinfo=None):
+        """Initialize the record like ``logging.LogRecord``."""
+        self.name = name
+        self.msg = msg
+        # Same special case as ``logging.LogRecord`` for a single mapping argument.
+        if args and len(args) == 1 and isinstance(args[0], Mapping) and args[0]:
+            args = args[0]
+        self.args = args
+        self.levelno = level
+        self.pathname = pathname
+        self.lineno = lineno
+        self.funcName = func
+        self.created = time.time()
+        self.exc_info = exc_info
+        self.exc_text = None
+        self.stack_info = sinfo
+        self.thread = threading.get_ident() if logging.logThreads else None
+        self.instance_name = ""
+
+    @property
+    def levelname(self):
+        """Name of the level."""
+        return logging.getLevelName(self.levelno)
+
+    @property
+    def filename(self):
+        """File name part of ``pathname``."""
+        return os.path.basename(self.pathname)  # noqa: PTH119
+
+    @property
+    def module(self):
+        """Module part of ``pathname``."""
+        # Read for each formatted record, so ``pathlib`` would cost too much.
+        return os.path.splitext(os.path.basename(self.pathname))[0]  # noqa: PTH119, PTH122
+
+    @property
+    def msecs(self):
+        """Millisecond part of ``created``."""
+        return (self.created - int(self.created)) * 1000
+
+    @property
+    def relativeCreated(self):
+        """Time in milliseconds since the ``logging`` module was loaded."""
+        return (self.created - logging._startTime) * 1000
+
+    @property
+    def process(self):
+        """Identifier of the process."""
+        return os.getpid() if logging.logProcesses else None
+
+    @property
+    def __dict__(self):
+        """Return a new dictionary of all the attributes."""
+        attributes = {}
+        for name in _RECORD_ATTRIBUTES:
+            value = getattr(self, name, _NOT_SET)
+            if value is not _NOT_SET:
+                attributes[name] = value
+        return attributes
+
+    def getMessage(self):
+        """Return the message merged with its arguments."""
+        msg = str(self.msg)
+        if self.args:
+            msg = msg % self.args
+        return msg
+
+    def __repr__(self):
+        """Return the same representation as ``logging.LogRecord``."""
+        return (
+            f"<CompactLogRecord: {self.name}, {self.levelno}, {self.pathname}, {self.lineno}, "
+            f'"{self.msg}">'
+        )
+
+
+_NOT_SET = object()
+_RECORD_ATTRIBUTES = CompactLogRecord.__slots__ + (
+    "levelname",
+    "filename",
+    "module",
+    "msecs",
+    "relativeCreated",
+    "process",
+    "threadName",
+    "processName",
+    "taskName",
+)
+
+
+# Plain ``logging.Logger`` objects, such as the ``pyproject_global.<module>``
+# loggers of ``logging.getLogger``, cache their level checks until the
+# standard ``Manager._clear_cache``. They are looked up again only when the
+# logger dictionary changed since the last lookup: its size, or one of its
+# placeholders replaced by a logger.
+_plain_loggers = ([], [], -1)  # Plain loggers, named placeholders, dictionary size.
+
+
+def _clear_plain_logger_caches():
+    """Clear the level caches of the plain loggers after a level change."""
+    global _plain_loggers
+    with logging._lock:
+        logger_dict = logging.root.manager.loggerDict
+        loggers, placeholders, size = _plain_loggers
+        if len(logger_dict) != size or any(
+            logger_dict.get(name) is not placeholder for name, placeholder in placeholders
+        ):
+            loggers, placeholders = [], []
+            for name, each in logger_dict.items():
+                if isinstance(each, logging.PlaceHolder):
+                    placeholders.append((name, each))
+                elif not isinstance(each, PyAnsysLogger):
+                    loggers.append(each)
+            _plain_loggers = (loggers, placeholders, len(logger_dict))
+        for each in loggers:
+            each._cache.clear()
+
+
+class PyAnsysLogger(logging.Logger):
+    """Logger with O(1) level checks and levels inherited from a global logger.
+
+    The standard ``setLevel`` method clears the level cache of every logger
+    of the process. This logger only starts a new level generation instead,
+    and each logger computes its threshold again at its next check. Only
+    the plain ``logging.Logger`` objects still have their caches cleared.
+
+    A logger without its own level follows the level of its
+    ``level_parent`` logger, such as ``pyproject_global`` for the child and
+    instance loggers, including its later changes.
+    """
+
+    # Create ``CompactLogRecord`` records, set by ``Logger``.
+    compact_records = False
+
+    def __init__(self, name, level=logging.NOTSET):
+        """Initialize the logger without level parent."""
+        super().__init__(name, level)
+        self.level_parent = None
+
+    def makeRecord(
+        self, name, level, fn, lno, msg, args, exc_info, func=None, extra=None, sinfo=None
+    ):
+        """Create a record, compact if ``compact_records`` and the extra fields allow it."""
+        context = _log_context.get()
+        if (
+            not self.compact_records
+            or (extra and (len(extra) != 1 or "instance_name" not in extra))
+            or (context and (len(context) != 1 or "instance_name" not in context))
+        ):
+            return super().makeRecord(name, level, fn, lno, msg, args, exc_info, func, extra, sinfo)
+        record = CompactLogRecord(name, level, fn, lno, msg, args, exc_info, func, sinfo)
+        if extra:
+            record.instance_name = extra["instance_name"]
+        return record
+
+    def setLevel(self, level):
+        """Set the level of the logger in constant time."""
+        global _level_generation
+        # Names added with ``logging.addLevelName`` are accepted, like ``Logger.setLevel``.
+        self.level = logging._checkLevel(level)
+        _level_generation = next(_level_generations)
+        _clear_plain_logger_caches()
+
+    def getEffectiveLevel(self):
+        """Return the level of the logger, of its level parent, or of its ancestors."""
+        if self.level or self.level_parent is None:
+            return super().getEffectiveLevel()
+        return self.level_parent.getEffectiveLevel()
+
+    def isEnabledFor(self, level):
+        """Return whether a record of this level would be processed."""
+        if self.disabled:
+            return False
+        # ``logging.disable`` clears this dictionary too.
+        try:
+            return level >= self._cache[_level_generation]
+        except KeyError:
+            return level >= self._refresh_threshold()
+
+    def _refresh_threshold(self):
+        generation = _level_generation
+        threshold = max(self.getEffectiveLevel(), self.manager.disable + 1)
+        self._cache.clear()
+        self._cache[generation] = threshold
+        return threshold
+
+
+def _get_logger(name):
+    """Return the logger ``name``, created as a ``PyAnsysLogger`` if it does not exist."""
+    manager = logging.root.manager
+    # ``getLogger`` takes the same lock, so no other logger is created with
+    # this class meanwhile.
+    with logging._lock:
+        logger_class = manager.loggerClass
+        manager.loggerClass = PyAnsysLogger
+        try:
+            return manager.getLogger(name)
+        finally:
+            manager.loggerClass = logger_class
+
+
+_NOT_EVALUATED = object()
+
+
+class LazyArg:
+    """Log argument computed only when a record using it is formatted.
+
+    Log calls below the level of the logger or of all its handlers never
+    call the function. Otherwise, it is called once, and its result is
+    reused by every handler formatting the record.
+
+    Parameters
+    ----------
+    function : callable
+        Function computing the argument.
+    *args, **kwargs
+        Arguments of ``function``.
+    """
+
+    __slots__ = ("_function", "_args", "_kwargs", "_value", "_lock")
+
+    def __init__(self, function, *args, **kwargs):
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._value = _NOT_EVALUATED
+        # Held while the function runs, so that it runs only once when handlers
+        # format the record in several threads. Each argument has its own lock,
+        # so a slow function only delays the records using it.
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        """Result of the function, computed at the first access."""
+        if self._value is _NOT_EVALUATED:
+            with self._lock:
+                if self._value is _NOT_EVALUATED:
+                    self._value = self._function(*self._args, **self._kwargs)
+                    # Released for the garbage collector.
+                    self._function = self._args = self._kwargs = None
+        return self._value
+
+    def __str__(self):
+        """Return the result of the function as a string, for ``%s``."""
+        return str(self.value)
+
+    def __repr__(self):
+        """Return the representation of the result of the function, for ``%r``."""
+        return repr(self.value)
+
+    def __format__(self, format_spec):
+        """Format the result of the function, for ``{}`` format strings."""
+        return format(self.value, format_spec)
+
+    def __int__(self):
+        """Return the result of the function as an integer, for ``%d``."""
+        return int(self.value)
+
+    def __index__(self):
+        """Return the result of the function as an integer, for ``%x`` and ``%o``."""
+        return operator.index(self.value)
+
+    def __float__(self):
+        """Return the result of the function as a float, for ``%f``."""
+        return float(self.value)
+
+
 class InstanceCustomAdapter(logging.LoggerAdapter):
     """Keeps the reference to a product instance name dynamic.
 
@@ -57,15 +446,79 @@ class InstanceCustomAdapter(logging.LoggerAdapter):
         self.extra = extra
         self.file_handler = logger.file_handler
         self.std_out_handler = logger.std_out_handler
+        self.refresh_instance_name()
+
+    @property
+    def instance_name(self):
+        """Cached name of the product instance."""
+        return self._extra["instance_name"]
+
+    def refresh_instance_name(self):
+        """Read the name of the product instance again.
+
+        The name is cached when the adapter is created. The product instance
+        must call this method when its name changes.
+        """
+        name = self.extra.get_name() if self.extra is not None else ""
+        # A new dictionary, so records being created keep a consistent name.
+        self._extra = {"instance_name": name}
 
     def process(self, msg, kwargs):
         """Get instance_name for logging."""
-        kwargs["extra"] = {}
-        # These are the extra parameters sent to log
-        # here self.extra is the argument pass to the log records.
-        kwargs["extra"]["instance_name"] = self.extra.get_name()
+        # These are the extra parameters sent to log. The cached dictionary
+        # is reused unless the caller supplies its own fields.
+        extra = kwargs.get("extra")
+        if extra:
+            kwargs["extra"] = {**self._extra, **extra}
+        else:
+            kwargs["extra"] = self._extra
         return msg, kwargs
 
+    def _log(self, level, msg, args, kwargs):
+        msg, kwargs = self.process(msg, kwargs)
+        # Skip this method and the public one calling it when looking for the caller.
+        kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 2
+        self.logger.log(level, msg, *args, **kwargs)
+
+    # The level is checked before any other work, so calls for disabled
+    # levels cost a single cached lookup.
+
+    def debug(self, msg, *args, **kwargs):
+        """Log a message with severity ``DEBUG``."""
+        if self.logger.isEnabledFor(DEBUG):
+            self._log(DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        """Log a message with severity ``INFO``."""
+        if self.logger.isEnabledFor(INFO):
+            self._log(INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        """Log a message with severity ``WARNING``."""
+        if self.logger.isEnabledFor(WARN):
+            self._log(WARN, msg, args, kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        """Log a message with severity ``ERROR``."""
+        if self.logger.isEnabledFor(ERROR):
+            self._log(ERROR, msg, args, kwargs)
+
+    def exception(self, msg, *args, exc_info=True, **kwargs):
+        """Log a message with severity ``ERROR`` and the exception information."""
+        if self.logger.isEnabledFor(ERROR):
+            kwargs["exc_info"] = exc_info
+            self._log(ERROR, msg, args, kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        """Log a message with severity ``CRITICAL``."""
+        if self.logger.isEnabledFor(CRITICAL):
+            self._log(CRITICAL, msg, args, kwargs)
+
+    def log(self, level, msg, *args, **kwargs):
+        """Log a message with the given integer severity level."""
+        if self.logger.isEnabledFor(level):
+            self._log(level, msg, args, kwargs)
+
     def log_to_file(self, filename=FILE_NAME, level=LOG_LEVEL):
         """Add file handler to logger.
 
@@ -94,72 +547,2750 @@ class InstanceCustomAdapter(logging.LoggerAdapter):
         if self.std_out_handler:
             raise Exception("Stdout logger already defined.")
 
-        self.logger = add_stdout_handler(self.logger, level=level)
-        self.std_out_handler = self.logger.std_out_handler
+        self.logger = add_stdout_handler(self.logger, level=level)
+        self.std_out_handler = self.logger.std_out_handler
+
+    def span(self, name):
+        """Measure the duration of an operation on the product instance.
+
+        See :meth:`SpanRecorder.span`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the operation.
+
+        Returns
+        -------
+        Span
+            Context manager and decorator measuring the operation.
+        """
+        recorder = getattr(self.logger, "span_recorder", None)
+        if recorder is None:
+            recorder = self.logger.span_recorder = SpanRecorder(self.logger)
+        return recorder.span(name, self._extra["instance_name"])
+
+    def add_flight_recorder(self, capacity=FLIGHT_RECORDER_CAPACITY, level=logging.DEBUG):
+        """Keep the last records of the product instance in a ring of their own.
+
+        The ring belongs to the flight recorder of the ``Logger``, if any.
+        Otherwise, a flight recorder is added to this instance logger, which
+        writes the records with its file or standard output handler. See
+        :meth:`Logger.add_flight_recorder`.
+
+        Parameters
+        ----------
+        capacity : int, optional
+            Number of records kept. The default is ``FLIGHT_RECORDER_CAPACITY``.
+        level : int, optional
+            Minimum level of the recorded records. The instance logger level
+            is lowered to it if needed. The default is ``logging.DEBUG``.
+
+        Returns
+        -------
+        PyAnsysFlightRecorder
+            Handler recording the records.
+        """
+        recorder = getattr(self.logger, "flight_recorder", None)
+        if recorder is None:
+            recorder = PyAnsysFlightRecorder(
+                capacity, target=self.file_handler or self.std_out_handler
+            )
+            recorder.setLevel(level)
+            self.logger.flight_recorder = recorder
+            with logging._lock:
+                self.logger.handlers.insert(0, recorder)
+        recorder.set_capacity(self.logger.name, capacity)
+        if self.logger.getEffectiveLevel() > level:
+            # Other handlers keep filtering with the previous level.
+            self.logger.setLevel(level)
+        return recorder
+
+    def ingest(self, chunks, level=logging.INFO, source="server"):
+        """Log the product log received from the server of the product instance.
+
+        See :meth:`Logger.ingest`.
+
+        Parameters
+        ----------
+        chunks : iterable[bytes]
+            Chunks of the UTF-8 log, split anywhere.
+        level : int, optional
+            Level of the lines without level at the start of the log. The
+            default is ``logging.INFO``.
+        source : str, optional
+            Module of the records. The default is ``"server"``.
+
+        Returns
+        -------
+        int
+            Number of records logged.
+        """
+        return _ingest(self.logger, chunks, self._extra, level, source)
+
+    def setLevel(self, level="DEBUG"):
+        """Change the log level of the object and the attached handlers.
+
+        With a flight recorder, the logger level never exceeds its level.
+        """
+        if isinstance(level, str):
+            level = string_to_loglevel[level.upper()]
+        recorder = getattr(self.logger, "flight_recorder", None)
+        self.logger.setLevel(level if recorder is None else min(level, recorder.level))
+        for each_handler in self.logger.handlers:
+            if each_handler is self.logger.shared_handler:
+                # Shared with other loggers, so only this logger level is changed.
+                each_handler.set_level(self.logger.name, level)
+            elif each_handler is not recorder:
+                each_handler.setLevel(level)
+        self.level = level
+
+
+# Matches a ``%%`` escape or a ``%(name)`` field with its conversion specifier.
+_FORMAT_FIELD = re.compile(
+    r"%%|%\((?P<name>[^)]+)\)(?P<spec>[#0+ -]*(?:\*|\d+)?(?:\.(?:\*|\d+))?[diouxXeEfFgGcrsa])"
+)
+
+
+class PyAnsysPercentStyle(logging.PercentStyle):
+    """Log message formatting.
+
+    The format string is compiled once into a positional template and a
+    getter that reads only the record attributes used by the format.
+    """
+
+    def __init__(self, fmt, *, defaults=None):
+        self._fmt = fmt or self.default_format
+        self._defaults = defaults
+
+        fields = []
+
+        def to_positional(match):
+            if match.group("name") is None:
+                return "%%"
+            fields.append(match.group("name"))
+            return "%" + match.group("spec")
+
+        self._template = _FORMAT_FIELD.sub(to_positional, self._fmt)
+        self._fields = tuple(fields)
+        if len(fields) > 1:
+            self._getter = attrgetter(*fields)
+        elif fields:
+            # ``attrgetter`` only returns a tuple for several attributes.
+            single_getter = attrgetter(fields[0])
+            self._getter = lambda record: (single_getter(record),)
+        else:
+            self._getter = lambda record: ()
+
+    def _format(self, record):
+        try:
+            values = self._getter(record)
+        except AttributeError:
+            # Fields missing in the record fall back to the defaults.
+            values = self._values_with_defaults(record)
+        return self._template % values
+
+    def _values_with_defaults(self, record):
+        defaults = self._defaults or {}
+        values = []
+        for name in self._fields:
+            try:
+                values.append(getattr(record, name))
+            except AttributeError:
+                if name in defaults:
+                    values.append(defaults[name])
+                elif name == "instance_name":
+                    # For the case of logging exceptions to the logger.
+                    values.append("")
+                else:
+                    # Reported by ``PercentStyle.format`` as a missing field.
+                    raise KeyError(name)
+        return tuple(values)
+
+
+class PyProjectFormatter(logging.Formatter):
+    """Customized ``Formatter`` class used to overwrite the defaults format styles.
+
+    The last formatted output is cached for each thread, so handlers sharing
+    the same format, such as the standard output and file handlers, format
+    each record only once. The cache only keeps a weak reference to the
+    record, so the record, its arguments, and its traceback are not kept
+    alive by it.
+    """
+
+    def __init__(
+        self,
+        fmt=STDOUT_MSG_FORMAT,
+        datefmt=None,
+        style="%",
+        validate=True,
+        defaults=None,
+    ):
+        if sys.version_info[1] < 8:
+            super().__init__(fmt, datefmt, style)
+        else:
+            # 3.8: The validate parameter was added
+            super().__init__(fmt, datefmt, style, validate)
+        self._style = PyAnsysPercentStyle(fmt, defaults=defaults)  # overwriting
+        self._uses_time = self._style.usesTime()
+        self._cache_key = (type(self), self._style._fmt, datefmt, defaults)
+
+    def format(self, record):
+        """Format the record, reusing the output of an identical formatter."""
+        # The handlers of a logger run one after the other in the thread of
+        # the caller. Adding the cache as a record attribute instead would
+        # unshare the keys of the record ``__dict__``, which costs more than
+        # the formatting itself.
+        last = getattr(_last_formatted, "entry", None)
+        if last is not None and last[0]() is record and last[1] == self._cache_key:
+            return last[2]
+
+        if record.exc_info or record.exc_text or record.stack_info:
+            output = super().format(record)
+        else:
+            # Same steps as ``logging.Formatter.format`` for a record without
+            # traceback, calling the compiled style directly.
+            record.message = record.getMessage()
+            if self._uses_time:
+                record.asctime = self.formatTime(record, self.datefmt)
+            try:
+                output = self._style._format(record)
+            except KeyError as e:
+                raise ValueError(f"Formatting field not found in record: {e}")
+
+        try:
+            _last_formatted.entry = (weakref.ref(record), self._cache_key, output)
+        except TypeError:
+            _last_formatted.entry = None  # Records without weak references are not cached.
+        return output
+
+
+# Last record formatted by a ``PyProjectFormatter`` in each thread.
+_last_formatted = threading.local()
+
+
+class PyAnsysQueueHandler(logging.Handler):
+    """Send records to a bounded queue processed by a background thread.
+
+    Log calls only put the record in the queue. A listener thread, started
+    with the first record, takes the records from the queue and passes them
+    to the target handlers, which do the formatting and the file or standard
+    output I/O.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of records waiting in the queue. The default
+        is ``QUEUE_SIZE``.
+    overflow : str, optional
+        Policy applied when the queue is full. Options are ``"block"``,
+        which waits for a free slot, ``"drop_oldest"``, which discards the
+        oldest queued record, and ``"drop_new"``, which discards the new
+        record. The default is ``"block"``. Records logged from a running
+        event loop are never waited for: with ``"block"``, they are
+        discarded if the queue is full.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, overflow="block"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"``overflow`` must be one of {', '.join(OVERFLOW_POLICIES)}, not '{overflow}'."
+            )
+        # ``logging.handlers`` is only imported by the loggers using a queue.
+        import logging.handlers
+
+        super().__init__()
+        self.queue = queue.Queue(maxsize)
+        self.overflow = overflow
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, respect_handler_level=True)
+        self._closed = False
+        _QUEUE_HANDLERS.add(self)
+
+    @property
+    def targets(self):
+        """Handlers fed by the listener thread."""
+        return self.listener.handlers
+
+    def add_target(self, handler):
+        """Add a handler to the ones fed by the listener thread."""
+        # Replacing the tuple is atomic for the listener thread reading it.
+        self.listener.handlers = self.listener.handlers + (handler,)
+
+    def remove_target(self, handler):
+        """Remove a handler from the ones fed by the listener thread."""
+        self.listener.handlers = tuple(
+            each for each in self.listener.handlers if each is not handler
+        )
+
+    def emit(self, record):
+        """Queue the record if at least one target handler writes it."""
+        # Otherwise, its lazy arguments would be evaluated when merging the message.
+        for handler in self.listener.handlers:
+            if record.levelno >= handler.level:
+                try:
+                    self.enqueue(self.prepare(record))
+                except Exception:
+                    self.handleError(record)
+                return
+
+    def prepare(self, record):
+        """Merge the message with its arguments, which may change after the call.
+
+        The record stays in this process, so unlike ``QueueHandler.prepare``,
+        it is neither copied nor formatted: the target handlers format it in
+        the listener thread.
+        """
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        """Put a record in the queue, applying the overflow policy if it is full."""
+        # ``Handler.handle`` holds the handler lock here, so the counter is safe.
+        if self._closed:
+            # Nothing would ever consume the record.
+            self.dropped += 1
+            return
+        if self.listener._thread is None:
+            self.listener.start()
+
+        if self.overflow == "block":
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                if _in_event_loop():
+                    # Waiting would stall every task of the event loop.
+                    self.dropped += 1
+                    return
+                self.queue.put(record)
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if self.overflow == "drop_new":
+                    return
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                except queue.Empty:
+                    pass
+
+    def flush(self):
+        """Wait until the listener thread has handled all queued records."""
+        if self.listener._thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """Drain the queue, stop the listener thread, and close the target handlers."""
+        self.acquire()
+        try:
+            self._closed = True
+            if self.listener._thread is not None:
+                # Unlike ``QueueListener.stop``, waits for a free slot
+                # instead of losing the stop sentinel on a full queue.
+                self.queue.put(self.listener._sentinel)
+                self.listener._thread.join()
+                self.listener._thread = None
+            for handler in self.targets:
+                handler.close()
+        finally:
+            self.release()
+        _QUEUE_HANDLERS.discard(self)
+        super().close()
+
+    def _after_fork(self):
+        """Drop the records queued in the parent, which handles them, in a forked child."""
+        self.queue = self.listener.queue = queue.Queue(self.queue.maxsize)
+        # The listener thread does not exist in the child: it starts again with the next record.
+        self.listener._thread = None
+
+
+def _in_event_loop():
+    """Return whether an asyncio event loop is running in this thread."""
+    # Without ``asyncio`` imported, no event loop can run, so it is not imported here.
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is None:
+        return False
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# Queue handlers still running. They are drained at exit, before
+# ``logging.shutdown`` closes their target handlers.
+_QUEUE_HANDLERS = weakref.WeakSet()
+
+
+@atexit.register
+def _close_queue_handlers():
+    for handler in list(_QUEUE_HANDLERS):
+        handler.close()
+
+
+def _iter_handlers(handlers):
+    """Yield the handlers and the targets of the queue handlers among them."""
+    for handler in handlers:
+        yield handler
+        if isinstance(handler, PyAnsysQueueHandler):
+            yield from handler.targets
+
+
+def _unopened(handler):
+    """Return whether a file handler has not opened its file yet."""
+    return (
+        isinstance(handler, logging.FileHandler)
+        and handler.stream is None
+        and not getattr(handler, "_buffer", None)
+    )
+
+
+class _LevelCounter(logging.Filter):
+    """Count the records reaching this filter, per level.
+
+    Each thread increments its own integers, so the counters need no lock
+    on the logging path. The snapshot sums them.
+    """
+
+    def __init__(self, kind):
+        super().__init__()
+        self.kind = kind
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = []  # Thread and counts of each thread that counted records.
+        self._finished = {}  # Counts of the threads that exited.
+
+    def filter(self, record):
+        """Count the record and let it pass."""
+        try:
+            counts = self._local.counts
+        except AttributeError:
+            counts = self._local.counts = {}
+            with self._lock:
+                self._threads.append((threading.current_thread(), counts))
+        counts[record.levelno] = counts.get(record.levelno, 0) + 1
+        return True
+
+    def snapshot(self):
+        """Return the number of records of each level."""
+        with self._lock:
+            totals = dict(self._finished)
+            threads = []
+            for thread, counts in self._threads:
+                alive = thread.is_alive()
+                for level, count in list(counts.items()):
+                    totals[level] = totals.get(level, 0) + count
+                    if not alive:
+                        # Final: kept once, without the thread.
+                        self._finished[level] = self._finished.get(level, 0) + count
+                if alive:
+                    threads.append((thread, counts))
+            self._threads = threads
+        return totals
+
+
+def _count_records(logger):
+    """Count the records of a logger before and after its other filters."""
+    if not any(isinstance(each, _LevelCounter) for each in logger.filters):
+        logger.filters.insert(0, _LevelCounter("received"))
+        logger.filters.append(_LevelCounter("emitted"))
+
+
+def _add_filter(logger, log_filter):
+    """Add a filter to a logger, before the counter of emitted records."""
+    if log_filter in logger.filters:
+        return
+    filters = logger.filters
+    if filters and isinstance(filters[-1], _LevelCounter):
+        filters.insert(len(filters) - 1, log_filter)
+    else:
+        filters.append(log_filter)
+
+
+class _HandlerStats:
+    """Size in bytes of the records written by a handler, and time it spent.
+
+    It is only updated while the handler lock is held.
+    """
+
+    __slots__ = ("bytes", "format_ns", "emit_ns")
+
+    def __init__(self):
+        self.bytes = 0
+        self.format_ns = 0
+        self.emit_ns = 0
+
+
+class _CountingFormatter(logging.Formatter):
+    """Measure the time spent by a formatter and keep its last output."""
+
+    def __init__(self, formatter, stats):
+        super().__init__()
+        self.formatter = formatter
+        self._stats = stats
+        self.output = None
+
+    def format(self, record):
+        """Format the record with the measured formatter."""
+        start = time.perf_counter_ns()
+        output = self.formatter.format(record)
+        self._stats.format_ns += time.perf_counter_ns() - start
+        # Counted once written, even if the record was formatted several times.
+        self.output = output
+        return output
+
+
+def _count_bytes(handler, size):
+    """Add the size of a record written by a handler without a formatter to its statistics."""
+    stats = getattr(handler, "pyansys_stats", None)
+    if stats is not None:
+        stats.bytes += size
+
+
+def _count_handler(handler):
+    """Measure the size of the records and the time spent by a handler."""
+    stats = handler.pyansys_stats = _HandlerStats()
+    if handler.formatter is not None:
+        handler.formatter = _CountingFormatter(handler.formatter, stats)
+    emit = type(handler).emit
+    # A weak reference, so the handler does not reference itself.
+    handler_ref = weakref.ref(handler)
+
+    def counted_emit(record):
+        handler = handler_ref()
+        formatter = handler.formatter
+        if isinstance(formatter, _CountingFormatter):
+            formatter.output = None
+        start = time.perf_counter_ns()
+        emit(handler, record)
+        stats.emit_ns += time.perf_counter_ns() - start
+
+        output = getattr(formatter, "output", None)
+        if output is not None:
+            # Size of the encoded output and terminator, as written to the stream.
+            stream = getattr(handler, "stream", None)
+            encoding = getattr(stream, "encoding", None) or "utf-8"
+            errors = getattr(stream, "errors", None) or "strict"
+            try:
+                text = output + getattr(handler, "terminator", "\n")
+                stats.bytes += len(text.encode(encoding, errors))
+            except UnicodeError:
+                pass  # Not written either.
+
+    handler.emit = counted_emit
+
+
+def _handler_label(handler):
+    if isinstance(handler, logging.FileHandler):
+        return handler.baseFilename
+    if getattr(handler, "stream", None) is sys.stdout:
+        return "stdout"
+    return handler.name or f"{type(handler).__name__}-{id(handler):x}"
+
+
+def _stats_snapshot(logger, loggers):
+    """Return the counters of ``loggers`` and of the handlers of ``logger``."""
+    records = {}
+    for each in loggers:
+        counters = {f.kind: f.snapshot() for f in each.filters if isinstance(f, _LevelCounter)}
+        if not counters:
+            continue
+        received = counters["received"]
+        emitted = counters["emitted"]
+        records[each.name] = {
+            logging.getLevelName(level): {
+                "emitted": emitted.get(level, 0),
+                "filtered": count - emitted.get(level, 0),
+            }
+            for level, count in sorted(received.items())
+        }
+
+    handlers = {}
+    dropped = 0
+    for handler in _iter_handlers(logger.handlers):
+        if isinstance(handler, PyAnsysQueueHandler):
+            dropped += handler.dropped
+        stats = getattr(handler, "pyansys_stats", None)
+        if stats is not None:
+            handlers[_handler_label(handler)] = {
+                "bytes": stats.bytes,
+                "format_seconds": stats.format_ns / 1e9,
+                # Formatting happens during the emission.
+                "emit_seconds": (stats.emit_ns - stats.format_ns) / 1e9,
+            }
+    return {"records": records, "dropped": dropped, "handlers": handlers}
+
+
+def _live_loggers(logger, instances):
+    """Return ``logger`` and the loggers of the live child and instance loggers."""
+    loggers = [logger]
+    for each in list(instances.values()):
+        loggers.append(each.logger if isinstance(each, logging.LoggerAdapter) else each)
+    return loggers
+
+
+def _dump_stats(logger, instances, interval, level, stopped):
+    import json
+
+    while not stopped.wait(interval):
+        snapshot = _stats_snapshot(logger, _live_loggers(logger, instances))
+        logger.log(level, "Logging statistics: %s", json.dumps(snapshot))
+
+
+def _attach_handler(logger, handler, asynchronous):
+    """Add a handler to a logger, behind its queue handler if ``asynchronous``.
+
+    Returns the queue handler feeding the handler, if any.
+    """
+    if not asynchronous:
+        logger.addHandler(handler)
+        return None
+
+    for queue_handler in logger.handlers:
+        if isinstance(queue_handler, PyAnsysQueueHandler):
+            break
+    else:
+        queue_handler = PyAnsysQueueHandler()
+        logger.addHandler(queue_handler)
+    queue_handler.add_target(handler)
+    return queue_handler
+
+
+class PyAnsysFanInHandler(logging.Handler):
+    """Route the records of child and instance loggers to the global handlers.
+
+    A single instance is shared by all the child loggers of a ``Logger``, so
+    the number of handlers and locks does not grow with the number of
+    loggers. Each destination keeps one handler, whose lock serializes the
+    writes of all the loggers.
+
+    A child logger can lower the level of the global handlers for its own
+    records. The loggers below the global logger propagate to it, so their
+    records reach the global handlers and the root handlers like the ones
+    of any standard logger: this handler only passes them the records that
+    reach the lower level of their logger and not the level of the handler.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        Logger owning the handlers where records are routed to.
+    """
+
+    def __init__(self, logger):
+        super().__init__()
+        self.target = logger
+        self.levels = {}
+        self._prefix = logger.name + "."
+        # Last record handled in each thread. A record logged below another
+        # child logger reaches this handler once for each of them.
+        self._last = threading.local()
+
+    def set_level(self, name, level):
+        """Lower the level of the global handlers for the records of a logger."""
+        self.levels[name] = level
+
+    def forget(self, name):
+        """Remove the level set for a logger."""
+        self.levels.pop(name, None)
+
+    def _thresholds(self, record):
+        """Return the level of each global handler for the record, or ``None`` to skip it."""
+        level = self.levels.get(record.name)
+        propagated = record.name.startswith(self._prefix)
+        for handler in self.target.handlers:
+            if record.levelno >= handler.level:
+                # Otherwise passed a second time by the propagation.
+                yield handler, None if propagated else handler.level
+            else:
+                yield handler, level
+
+    def handle(self, record):
+        """Pass the record to the global handlers whose level it reaches."""
+        try:
+            reference = weakref.ref(record)
+        except TypeError:
+            reference = None  # Records without weak references are never skipped.
+        else:
+            last = getattr(self._last, "record", None)
+            if last is not None and last() is record:
+                return True
+        self._last.record = reference
+        # No lock here: each global handler takes its own.
+        for handler, threshold in self._thresholds(record):
+            if threshold is not None and record.levelno >= threshold:
+                handler.handle(record)
+        return True
+
+    def emit(self, record):
+        """Pass the record to the global handlers."""
+        self.handle(record)
+
+    def handle_batch(self, records):
+        """Pass records to the global handlers whose level they reach, in a single batch each."""
+        selected = {handler: [] for handler in self.target.handlers}
+        for record in records:
+            for handler, threshold in self._thresholds(record):
+                if threshold is not None and record.levelno >= threshold:
+                    selected[handler].append(record)
+        for handler, batch in selected.items():
+            _emit_batch(handler, batch)
+
+
+# ``emit`` methods whose records can be written with a single write and flush.
+_STREAM_EMITS = (logging.StreamHandler.emit, logging.FileHandler.emit)
+
+
+def _emit_batch(handler, records):
+    """Emit records taking the lock of the handler once."""
+    if isinstance(handler, PyAnsysFanInHandler):
+        handler.handle_batch(records)
+        return
+    if not records:
+        return
+    handler.acquire()
+    try:
+        records = [record for record in records if handler.filter(record)]
+        # An ``emit`` replaced on the instance, such as by the statistics, is kept.
+        if getattr(handler.emit, "__func__", None) in _STREAM_EMITS:
+            _write_batch(handler, records)
+        else:
+            for record in records:
+                handler.emit(record)
+    finally:
+        handler.release()
+
+
+def _write_batch(handler, records):
+    """Write the records of a stream or file handler with a single write and flush."""
+    lines = []
+    for record in records:
+        try:
+            lines.append(handler.format(record) + handler.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            handler.handleError(record)
+    if not lines:
+        return
+    try:
+        if handler.stream is None:
+            handler.stream = handler._open()
+        handler.stream.write("".join(lines))
+        handler.flush()
+    except RecursionError:
+        raise
+    except Exception:
+        handler.handleError(records[-1])
+
+
+def _handle_batch(logger, records):
+    """Handle records like ``logger.handle``, taking each handler lock once for all of them."""
+    if logger.disabled:
+        return
+    records = [record for record in records if logger.filter(record)]
+    current = logger
+    fanned_in = set()
+    while current is not None and records:
+        for handler in current.handlers:
+            if isinstance(handler, PyAnsysFanInHandler):
+                # Shared by the child loggers on the way, but used once.
+                if handler not in fanned_in:
+                    fanned_in.add(handler)
+                    handler.handle_batch(records)
+            else:
+                _emit_batch(handler, [each for each in records if each.levelno >= handler.level])
+        if not current.propagate:
+            break
+        current = current.parent
+
+
+# Upper-case level at the start of a line of a product log, such as ``ERROR:``
+# or ``[INFO]``. Lines of prose, such as ``Error handling...``, do not match.
+_REMOTE_LEVEL = r"\[?(DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL)\]?(?:\s*[:-]\s*|\s+|$)"
+
+
+def parse_remote_log(chunks, level=logging.INFO):
+    """Parse a product log received as byte chunks into records.
+
+    The chunks can split lines and characters anywhere. A line starting with
+    an upper-case level, such as ``ERROR: message`` or ``[WARNING] message``,
+    starts a record. Other lines, such as the lines of a traceback, continue
+    the previous record.
+
+    Parameters
+    ----------
+    chunks : iterable[bytes]
+        Chunks of the UTF-8 log.
+    level : int, optional
+        Level of the lines without level before the first record. The
+        default is ``logging.INFO``.
+
+    Yields
+    ------
+    list[tuple[int, str]]
+        Level and message of the records completed by each chunk. The last
+        list holds the last record.
+    """
+    # Compiled when a product log is ingested rather than at import.
+    remote_level = re.compile(_REMOTE_LEVEL)
+    # Level and lines of the current record, joined once it is complete.
+    record = None
+    for lines in _split_lines(chunks):
+        completed = []
+        for line in lines:
+            text = line.rstrip(b"\r").decode("utf-8", errors="replace")
+            match = remote_level.match(text)
+            if match:
+                if record is not None:
+                    completed.append((record[0], "\n".join(record[1]).rstrip("\n")))
+                record = (string_to_loglevel[match.group(1)], [text[match.end() :]])
+            elif record is not None:
+                record[1].append(text)
+            elif text:
+                record = (level, [text])
+        yield completed
+    if record is not None:
+        yield [(record[0], "\n".join(record[1]).rstrip("\n"))]
+
+
+def _ingest(logger, chunks, extra, level, source):
+    """Log the records of a product log in a batch per chunk."""
+    count = 0
+    for records in parse_remote_log(chunks, level):
+        batch = [
+            logger.makeRecord(logger.name, levelno, source, 0, msg, (), None, "", extra)
+            for levelno, msg in records
+            if logger.isEnabledFor(levelno)
+        ]
+        _handle_batch(logger, batch)
+        count += len(batch)
+    return count
+
+
+def _split_lines(chunks):
+    """Yield the lines completed by each chunk, then the last line without line break."""
+    pending = []  # Parts of the line not completed yet, joined once it is.
+    for chunk in chunks:
+        *lines, last = chunk.split(b"\n")
+        if lines:
+            pending.append(lines[0])
+            lines[0] = b"".join(pending)
+            pending = []
+        if last:
+            pending.append(last)
+        yield lines
+    if pending:
+        yield [b"".join(pending)]
+
+
+class PyAnsysFileHandler(logging.FileHandler):
+    """File handler opening its file at the first record.
+
+    A session without records creates no file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file where the logs are recorded.
+    header : str, optional
+        Text written before the first record. The default is ``""``.
+    encoding : str, optional
+        Encoding of the file. The default is ``None``.
+    """
+
+    def __init__(self, filename, header="", encoding=None):
+        super().__init__(filename, encoding=encoding, delay=True)
+        self.header = header
+
+    def _open(self):
+        """Open the file and write the header, only once."""
+        stream = super()._open()
+        if self.header:
+            stream.write(self.header)
+            self.header = ""
+        return stream
+
+
+class PyAnsysRotatingFileHandler(logging.FileHandler):
+    """File handler starting a new segment by size or time interval.
+
+    The current segment is renamed with a timestamp suffix and a new one
+    starts with the same header. Rotated segments are compressed and the
+    oldest ones are deleted on a background thread, so log calls never wait
+    for them.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file where the logs are recorded.
+    max_bytes : int, optional
+        Size of a segment that triggers the rotation. The default is ``0``,
+        in which case the size is not checked.
+    interval : float, optional
+        Time in seconds after which a new segment starts. The default is
+        ``0``, in which case the time is not checked.
+    backup_count : int, optional
+        Maximum number of rotated segments kept. The default is ``0``, in
+        which case all of them are kept.
+    max_total_bytes : int, optional
+        Maximum size of all the rotated segments kept. The default is ``0``,
+        in which case there is no limit.
+    compression : str, optional
+        Module of the standard library compressing the rotated segments:
+        ``"gzip"``, ``"bz2"``, or ``"lzma"``. The default is ``"gzip"``.
+        Use ``None`` to keep the segments uncompressed.
+    header : str, optional
+        Text written at the beginning of the file and of each new segment.
+        The default is ``""``.
+    encoding : str, optional
+        Encoding of the file. The default is ``None``.
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_bytes=0,
+        interval=0,
+        backup_count=0,
+        max_total_bytes=0,
+        compression="gzip",
+        header="",
+        encoding=None,
+    ):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(
+                f"``compression`` must be one of {', '.join(COMPRESSIONS)} or None, "
+                f"not '{compression}'."
+            )
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.max_total_bytes = max_total_bytes
+        self.compression = compression
+        self.header = header
+        self._pending = []
+
+        # Sizes are counted in characters, which is enough to trigger the
+        # rotation and avoids asking the position of the stream.
+        self._size = 0
+        self._rollover_at = None
+
+    def _open(self):
+        """Open the segment at the first record and write its header."""
+        stream = super()._open()
+        self._size = stream.seek(0, 2)
+        if self.header:
+            stream.write(self.header)
+            self._size += len(self.header)
+        if self.interval:
+            self._rollover_at = time.time() + self.interval
+        return stream
+
+    def shouldRollover(self, record):
+        """Check if the record starts a new segment."""
+        if self._rollover_at is not None and time.time() >= self._rollover_at:
+            return True
+        if self.max_bytes:
+            # The formatted output is cached, so it is reused by ``emit``.
+            return self._size + len(self.format(record)) + 1 > self.max_bytes
+        return False
+
+    def emit(self, record):
+        """Write the record, starting a new segment first if needed."""
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.shouldRollover(record):
+                self.doRollover()
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            self.flush()
+            self._size += len(msg)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self):
+        """Rename the current segment, start a new one, and compress the previous one."""
+        from pathlib import Path
+
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        current = Path(self.baseFilename)
+        segment = current.with_name(f"{current.name}.{stamp}-{int(now * 1e6) % 1000000:06d}")
+        if current.exists():
+            current.replace(segment)
+            self._pending = [future for future in self._pending if not future.done()]
+            self._pending.append(_background_executor().submit(self._archive, segment))
+
+        self.stream = self._open()
+
+    def _archive(self, segment):
+        """Compress a rotated segment and apply the retention limits."""
+        import importlib
+        import shutil
+
+        try:
+            if self.compression is not None:
+                compressed = segment.with_name(segment.name + COMPRESSIONS[self.compression])
+                temporary = compressed.with_name(compressed.name + ".tmp")
+                open_compressed = importlib.import_module(self.compression).open
+                with segment.open("rb") as source, open_compressed(temporary, "wb") as dest:
+                    shutil.copyfileobj(source, dest)
+                temporary.replace(compressed)
+                segment.unlink()
+            self._apply_retention()
+        except OSError:
+            # Same policy as ``Handler.handleError``, without a record.
+            if logging.raiseExceptions:
+                traceback.print_exc()
+
+    def rotated_segments(self):
+        """Return the paths of the rotated segments, from the oldest to the newest."""
+        from pathlib import Path
+
+        current = Path(self.baseFilename)
+        pattern = re.compile(re.escape(current.name) + r"\.\d{8}-\d{6}-\d{6}(\.\w+)?")
+        return sorted(each for each in current.parent.iterdir() if pattern.fullmatch(each.name))
+
+    def _apply_retention(self):
+        segments = self.rotated_segments()
+        sizes = [each.stat().st_size for each in segments]
+        total = sum(sizes)
+        for segment, size in zip(segments, sizes):
+            too_many = self.backup_count and len(segments) > self.backup_count
+            too_large = self.max_total_bytes and total > self.max_total_bytes
+            if not (too_many or too_large):
+                break
+            segment.unlink()
+            segments = segments[1:]
+            total -= size
+
+    def close(self):
+        """Close the file and wait for the rotated segments to be archived."""
+        super().close()
+        for future in self._pending:
+            future.result()
+        self._pending = []
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _background_executor():
+    """Return the thread running the background work of the handlers."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            # Its worker thread finishes the pending work before the interpreter exits.
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyansys_logging")
+        return _executor
+
+
+# Message followed by the traceback, if any.
+_MESSAGE_FORMATTER = logging.Formatter("%(message)s")
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as a JSON object on a single line.
+
+    The object has the ``level``, ``instance_name``, ``module``, ``funcName``,
+    ``timestamp``, and ``message`` fields. The message includes the
+    traceback, if any.
+    """
+
+    def __init__(self, *args, **kwargs):
+        import json
+
+        super().__init__(*args, **kwargs)
+        # ``json.dumps`` creates an encoder at each call with these options.
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def format(self, record):
+        """Return the JSON object of the record."""
+        return self._encoder.encode(
+            {
+                "level": record.levelname,
+                "instance_name": getattr(record, "instance_name", ""),
+                "module": record.module,
+                "funcName": record.funcName,
+                "timestamp": record.created,
+                "message": _MESSAGE_FORMATTER.format(record),
+            }
+        )
+
+
+def _json_session_header():
+    from datetime import datetime
+    import json
+
+    return json.dumps({"session": datetime.now().isoformat()}) + "\n"
+
+
+def _encode_frame(kind, level, timestamp, instance_name="", module="", func_name="", message=""):
+    strings = [each.encode("utf-8") for each in (instance_name, module, func_name, message)]
+    sizes = [len(each) for each in strings]
+    size = _BINARY_FRAME.size - 4 + sum(sizes)
+    return _BINARY_FRAME.pack(size, kind, level, timestamp, *sizes) + b"".join(strings)
+
+
+class PyAnsysBinaryFileHandler(logging.FileHandler):
+    """Write records to a file as length-prefixed binary frames.
+
+    Each frame carries the level, instance name, module, function,
+    timestamp, and message of a record. Use :func:`read_records` to read
+    the file back.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file where the logs are recorded.
+    write_headers : bool, optional
+        Write a session frame, timestamped when the handler is created.
+        The default is ``False``.
+    """
+
+    def __init__(self, filename, write_headers=False):
+        # The file is opened at the first record.
+        super().__init__(filename, mode="ab", delay=True)
+        self._session = time.time() if write_headers else None
+
+    def _open(self):
+        """Open the file and write the magic number and the session frame."""
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write(BINARY_MAGIC)
+        if self._session is not None:
+            stream.write(_encode_frame(_SESSION_FRAME, 0, self._session))
+            self._session = None
+        stream.flush()
+        return stream
+
+    def emit(self, record):
+        """Write the frame of the record."""
+        try:
+            frame = _encode_frame(
+                _RECORD_FRAME,
+                record.levelno,
+                record.created,
+                getattr(record, "instance_name", ""),
+                record.module,
+                record.funcName,
+                _MESSAGE_FORMATTER.format(record),
+            )
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(frame)
+            self.flush()
+            _count_bytes(self, len(frame))
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class PyAnsysBufferedFileHandler(logging.FileHandler):
+    """File handler writing the records in batches.
+
+    The formatted records are kept in memory and written with a single call
+    when ``buffer_size`` bytes are buffered, when the first buffered record
+    is older than ``flush_interval``, or when a record reaches
+    ``flush_level``. The handler is also flushed when it is closed.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file where the logs are recorded.
+    buffer_size : int, optional
+        Number of buffered bytes triggering a write. The default is
+        ``BUFFER_SIZE``.
+    flush_interval : float, optional
+        Maximum time in seconds a record stays in the buffer. The default
+        is ``1.0``.
+    flush_level : int, optional
+        Minimum level of the records written immediately, with the rest of
+        the buffer. The default is ``logging.ERROR``.
+    fsync : str, optional
+        When the file is synchronized to the disk: ``"never"``, leaving it
+        to the operating system, ``"periodic"``, at most every
+        ``fsync_interval`` seconds, or ``"flush"``, after every write. The
+        default is ``"never"``.
+    fsync_interval : float, optional
+        Time in seconds between synchronizations with the ``"periodic"``
+        policy. The default is ``5.0``.
+    header : str, optional
+        Text written before the first record of the session. The default
+        is ``""``.
+    encoding : str, optional
+        Encoding of the file. The default is ``"utf-8"``.
+    """
+
+    def __init__(
+        self,
+        filename,
+        buffer_size=BUFFER_SIZE,
+        flush_interval=1.0,
+        flush_level=logging.ERROR,
+        fsync="never",
+        fsync_interval=5.0,
+        header="",
+        encoding=None,
+    ):
+        """Initialize the handler, which opens the file at its first write."""
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(
+                f"``fsync`` must be one of {', '.join(FSYNC_POLICIES)}, not '{fsync}'."
+            )
+        super().__init__(filename, mode="ab", delay=True)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._encoding = encoding or "utf-8"
+        self._buffer = []
+        self._buffered = 0
+        self._flush_at = None  # Deadline of the first buffered record.
+        self._synced_at = time.monotonic()
+        self._unsynced = False
+        self._header = header.encode(self._encoding)
+
+    def _append(self, data):
+        if self._header:
+            data = self._header + data
+            self._header = b""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._flush_at is None:
+            self._flush_at = time.monotonic() + self.flush_interval
+            # The flusher thread only starts with the first buffered record.
+            _register_buffered_handler(self)
+            _flusher_wakeup.set()
+
+    def emit(self, record):
+        """Buffer the record and write the buffer if a threshold is reached."""
+        try:
+            self._append((self.format(record) + self.terminator).encode(self._encoding))
+            if self._buffered >= self.buffer_size or record.levelno >= self.flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Write the buffer and synchronize the file according to ``fsync``."""
+        self.acquire()
+        try:
+            if self._buffer:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(b"".join(self._buffer))
+                self.stream.flush()
+                self._buffer.clear()
+                self._buffered = 0
+                self._flush_at = None
+                self._unsynced = True
+            if self._unsynced and (
+                self.fsync == "flush"
+                or (
+                    self.fsync == "periodic"
+                    and time.monotonic() >= self._synced_at + self.fsync_interval
+                )
+            ):
+                os.fsync(self.stream.fileno())
+                self._synced_at = time.monotonic()
+                self._unsynced = False
+        finally:
+            self.release()
+
+    def _next_flush(self):
+        """Return the time of the next timed write or synchronization, if any."""
+        if self._flush_at is not None:
+            return self._flush_at
+        if self._unsynced and self.fsync == "periodic":
+            return self._synced_at + self.fsync_interval
+        return None
+
+    def close(self):
+        """Write the buffer and close the file."""
+        self.acquire()
+        try:
+            _BUFFERED_HANDLERS.discard(self)
+            self.flush()
+            if self._unsynced and self.fsync != "never":
+                os.fsync(self.stream.fileno())
+            self._unsynced = False
+            super().close()
+        finally:
+            self.release()
+
+    def _after_fork(self):
+        """Drop the records buffered in the parent, which writes them, in a forked child."""
+        self._buffer = []
+        self._buffered = 0
+        self._flush_at = None
+        self._unsynced = False
+
+
+# A single thread writes the buffers of all the handlers when they expire,
+# and the summaries of the rate limits and spans at the end of their period.
+_BUFFERED_HANDLERS = weakref.WeakSet()
+_flusher_wakeup = threading.Event()
+_flusher = None
+
+
+def _register_buffered_handler(handler):
+    global _flusher
+    with _executor_lock:
+        _BUFFERED_HANDLERS.add(handler)
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_buffered_handlers, name="pyansys_logging_flusher", daemon=True
+            )
+            _flusher.start()
+
+
+def _flush_buffered_handlers():
+    while True:
+        # Cleared before the scan, so a record buffered meanwhile wakes it up again.
+        _flusher_wakeup.clear()
+        now = time.monotonic()
+        timeout = None
+        for handler in list(_BUFFERED_HANDLERS):
+            deadline = handler._next_flush()
+            if deadline is not None and deadline <= now:
+                try:
+                    handler.flush()
+                except Exception:
+                    if logging.raiseExceptions:
+                        traceback.print_exc()
+                deadline = handler._next_flush()
+            if deadline is not None:
+                wait = max(deadline - now, 0.0)
+                timeout = wait if timeout is None else min(timeout, wait)
+        _flusher_wakeup.wait(timeout)
+
+
+def _reinit_after_fork():
+    """Reset the module locks, background threads, and pending records in a forked child.
+
+    Only the forking thread exists in the child, so the locks held by the
+    other threads of the parent would never be released, and the listener,
+    flusher, and sender threads have to start again. The records buffered
+    or queued in the parent are dropped, since the parent writes them.
+    """
+    global _executor, _executor_lock, _flusher, _flusher_wakeup
+    _executor = None
+    _executor_lock = threading.Lock()
+    _flusher = None
+    _flusher_wakeup = threading.Event()
+    Logger._registry_lock = threading.RLock()
+    for each in [*_QUEUE_HANDLERS, *_BUFFERED_HANDLERS, *_FLIGHT_RECORDERS]:
+        each._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+def _instance_key(instance_name):
+    return zlib.crc32(instance_name.encode("utf-8"))
+
+
+class PyAnsysIndexedFileHandler(logging.FileHandler):
+    """Write records to a file and their byte offsets to a sidecar index.
+
+    The index has an entry for each session and each record, with its
+    offset, timestamp, level, and instance name hash. Use :class:`LogIndex`
+    to query it.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file where the logs are recorded. The index is written
+        next to it with the ``INDEX_SUFFIX`` suffix.
+    """
+
+    def __init__(self, filename):
+        # The file and the index are opened at the first record.
+        super().__init__(filename, mode="ab", delay=True)
+        self._index = None
+        self._sessions = []  # Headers and times of the sessions not written yet.
+        self._latest = 0.0
+
+    def _open(self):
+        """Open the file and the index, and write the pending sessions."""
+        from pathlib import Path
+
+        stream = super()._open()
+        # The file is written in binary mode, so the offsets are counted
+        # from the encoded records without asking the stream.
+        self._offset = stream.seek(0, 2)
+        if self._index is None:
+            self._index = Path(self.baseFilename + INDEX_SUFFIX).open("ab+")
+            if self._index.tell() == 0:
+                self._index.write(INDEX_MAGIC)
+            else:
+                self._latest = _last_latest(self._index)
+        for header, created in self._sessions:
+            self._write(stream, header, _SESSION_FRAME, 0, "", created)
+        self._sessions = []
+        return stream
+
+    def _write(self, stream, text, kind, level, instance_name, created):
+        data = text.encode("utf-8")
+        self._latest = max(self._latest, created)
+        self._index.write(
+            _INDEX_ENTRY.pack(
+                self._offset, created, self._latest, kind, level, _instance_key(instance_name)
+            )
+        )
+        stream.write(data)
+        self._offset += len(data)
+        # The file is flushed first, so the index never points past its end.
+        stream.flush()
+        self._index.flush()
+
+    def write_session(self, header):
+        """Write the header of a new session and index it.
+
+        The header is written with the first record of the session.
+        """
+        self.acquire()
+        try:
+            if self.stream is None:
+                self._sessions.append((header, time.time()))
+            else:
+                self._write(self.stream, header, _SESSION_FRAME, 0, "", time.time())
+        finally:
+            self.release()
+
+    def emit(self, record):
+        """Write the record and index it."""
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self._write(
+                self.stream,
+                self.format(record) + self.terminator,
+                _RECORD_FRAME,
+                record.levelno,
+                getattr(record, "instance_name", ""),
+                record.created,
+            )
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        """Close the file and the index."""
+        self.acquire()
+        try:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+        finally:
+            self.release()
+        super().close()
+
+
+def _last_latest(index):
+    """Return the latest timestamp of the last complete entry of an index."""
+    count = (index.seek(0, 2) - len(INDEX_MAGIC)) // _INDEX_ENTRY.size
+    if count == 0:
+        return 0.0
+    index.seek(len(INDEX_MAGIC) + (count - 1) * _INDEX_ENTRY.size)
+    latest = _INDEX_ENTRY.unpack(index.read(_INDEX_ENTRY.size))[2]
+    index.seek(0, 2)
+    return latest
+
+
+def _segment_path(filename, number):
+    from pathlib import Path
+
+    return Path(f"{filename}.{number:06d}")
+
+
+def _segment_numbers(filename):
+    """Return the numbers of the existing segments of ``filename``, in order."""
+    import glob
+    from pathlib import Path
+
+    path = Path(filename)
+    numbers = []
+    for each in path.parent.glob(glob.escape(path.name) + ".*"):
+        match = re.fullmatch(_SEGMENT_SUFFIX, each.name[len(path.name) :])
+        if match:
+            numbers.append(int(match.group(1)))
+    return sorted(numbers)
+
+
+class PyAnsysMappedFileHandler(logging.Handler):
+    """Write records into preallocated memory-mapped segments.
+
+    Each formatted record is copied into the mapped segment at a write
+    cursor, without any system call. The segments are files named after
+    ``filename`` with a six-digit sequence number, preallocated to
+    ``segment_size`` bytes. When a record does not fit, the segment is
+    truncated to its content and the next one starts. The last segment is
+    truncated when the handler is closed.
+
+    The header of a segment holds the end of the written data, updated
+    after each record, so :class:`SegmentReader` follows a live segment
+    without locks and never reads a partly written record.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the log file, which the segment names start with.
+    segment_size : int, optional
+        Size of a segment in bytes. The default is ``SEGMENT_SIZE``.
+    header : str, optional
+        Text written before the first record. The default is ``""``.
+    encoding : str, optional
+        Encoding of the records. The default is ``"utf-8"``.
+    """
+
+    terminator = "\n"
+
+    def __init__(self, filename, segment_size=SEGMENT_SIZE, header="", encoding="utf-8"):
+        """Initialize the handler, which starts its first segment at the first record."""
+        from pathlib import Path
+
+        super().__init__()
+        self.baseFilename = str(Path(filename).absolute())
+        self.segment_size = segment_size
+        self.encoding = encoding
+        self._header = header.encode(encoding)
+        self._number = None
+        self._stream = None
+        self._map = None
+        self._cursor = 0
+
+    def _start_segment(self, size):
+        import mmap
+
+        if self._number is None:
+            # Another session may have left segments with the same name.
+            numbers = _segment_numbers(self.baseFilename)
+            self._number = numbers[-1] if numbers else 0
+        self._number += 1
+        self._stream = _segment_path(self.baseFilename, self._number).open("w+b")
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(self._stream.fileno(), 0, size)
+        else:
+            self._stream.truncate(size)
+        self._map = mmap.mmap(self._stream.fileno(), size)
+        self._cursor = _SEGMENT_HEADER.size
+        _SEGMENT_HEADER.pack_into(self._map, 0, SEGMENT_MAGIC, self._cursor)
+
+    def _end_segment(self):
+        self._map.close()
+        self._map = None
+        # Readers never read past the end in the header, so this is safe for them.
+        self._stream.truncate(self._cursor)
+        self._stream.close()
+        self._stream = None
+
+    def emit(self, record):
+        """Copy the record into the segment, starting a new one if it is full."""
+        try:
+            data = (self.format(record) + self.terminator).encode(self.encoding)
+            if self._header:
+                data = self._header + data
+                self._header = b""
+            end = self._cursor + len(data)
+            if self._map is None or end > len(self._map):
+                if self._map is not None:
+                    self._end_segment()
+                self._start_segment(max(self.segment_size, _SEGMENT_HEADER.size + len(data)))
+                end = self._cursor + len(data)
+            self._map[self._cursor : end] = data
+            # Published after the data, so readers only see whole records.
+            _SEGMENT_END.pack_into(self._map, len(SEGMENT_MAGIC), end)
+            self._cursor = end
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Write the mapped segment to the disk."""
+        self.acquire()
+        try:
+            if self._map is not None:
+                self._map.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        """Truncate the last segment to its content and close it."""
+        self.acquire()
+        try:
+            if self._map is not None:
+                self._end_segment()
+        finally:
+            self.release()
+        super().close()
+
+
+# Fields of the records logged in the current thread or task, set by ``log_context``.
+_log_context = contextvars.ContextVar("pyansys_logging_context", default={})
+
+
+@contextmanager
+def log_context(instance_name=None, **fields):
+    """Attribute the records of the ``pyproject_global`` logger to a product instance.
+
+    Inside the ``with`` block, the records logged with the ``Logger``, which
+    have no instance name, get ``instance_name`` and the other ``fields``
+    as attributes. The context follows the current thread or asyncio task,
+    so a single logger serves many concurrent sessions without an instance
+    logger for each. Nested contexts add their fields to the outer ones.
+
+    Tasks created in the block inherit the context, like the functions run
+    by ``asyncio.to_thread``. For a thread pool, submit
+    ``contextvars.copy_context().run`` with the function.
+
+    Parameters
+    ----------
+    instance_name : str, optional
+        Name of the product instance. The default is ``None``, in which case
+        the instance name of the outer context is kept.
+    **fields
+        Other attributes of the records, such as a session ID.
+
+    Yields
+    ------
+    dict
+        Fields of the context.
+    """
+    for name in fields:
+        if name in _RECORD_ATTRIBUTES:
+            raise ValueError(f"Field '{name}' would overwrite an attribute of the records.")
+    context = dict(_log_context.get())
+    if instance_name is not None:
+        context["instance_name"] = instance_name
+    context.update(fields)
+    token = _log_context.set(context)
+    try:
+        yield context
+    finally:
+        _log_context.reset(token)
+
+
+class InstanceFilter(logging.Filter):
+    """Ensures that instance_name record always exists.
+
+    The records without instance name, or without the other fields of the
+    current :func:`log_context`, get them from the context.
+    """
+
+    def filter(self, record):
+        """If record had no attribute instance_name, create it and populate with empty string."""
+        context = _log_context.get()
+        if context:
+            for name, value in context.items():
+                if not getattr(record, name, ""):
+                    setattr(record, name, value)
+        if not hasattr(record, "instance_name"):
+            record.instance_name = ""
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Limit the rate of repeated records and summarize the dropped ones.
+
+    Records are grouped by instance name, level, and message template, so
+    the same call with different arguments counts as a repetition. Each
+    group has a token bucket: ``burst`` records pass at once, then
+    ``rate`` records per second. The records dropped in a group are
+    reported every ``window`` seconds by a single ``repeated N times``
+    record. The summaries are emitted at the end of the window by the
+    flusher thread of the buffered handlers, even if no record follows.
+
+    Parameters
+    ----------
+    rate : float, optional
+        Records per second allowed in each group once the burst is spent.
+        It must be positive. The default is ``1.0``.
+    burst : int, optional
+        Records allowed at once in each group. The default is ``10``.
+    window : float, optional
+        Time in seconds between the summaries of the dropped records. The
+        default is ``10.0``.
+    emit : callable, optional
+        Function handling the summary records, such as the ``handle``
+        method of a logger. By default, summaries are not emitted.
+    """
+
+    def __init__(self, rate=1.0, burst=10, window=10.0, emit=None):
+        """Initialize the buckets."""
+        if rate <= 0:
+            raise ValueError(f"``rate`` must be positive, not {rate}.")
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self._emit = emit
+        # Group: [tokens, time of the last record, dropped records, last dropped record].
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_summary = time.monotonic() + window
+        self._dropped = 0  # Records dropped since the last summaries.
+        # A bucket idle for this time is full again, so it can be forgotten.
+        self._idle = max(window, burst / rate)
+
+    def filter(self, record):
+        """Take a token from the group of the record, or drop the record."""
+        # ``__dict__`` of a ``CompactLogRecord`` is built on each access.
+        if getattr(record, "repeated", False):
+            return True  # Summary record.
+        msg = record.msg if isinstance(record.msg, str) else str(record.msg)
+        key = (getattr(record, "instance_name", ""), record.levelno, msg)
+        now = time.monotonic()
+        summaries = None
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0, None]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                allowed = True
+            else:
+                bucket[2] += 1
+                bucket[3] = record
+                allowed = False
+                self._dropped += 1
+            if now >= self._next_summary:
+                summaries = self._collect(now)
+            # The first drop of a window schedules its summaries.
+            scheduled = self._dropped == 1 and not allowed
+        if scheduled and self._emit is not None:
+            _register_buffered_handler(self)
+            _flusher_wakeup.set()
+        if summaries:
+            self._emit_summaries(summaries)
+        return allowed
+
+    def _collect(self, now, force=False):
+        """Return the summaries of the dropped records and forget the idle groups."""
+        self._next_summary = now + self.window
+        self._dropped = 0
+        summaries = []
+        for key, bucket in list(self._buckets.items()):
+            if bucket[2]:
+                summaries.append((bucket[3], bucket[2]))
+                bucket[2] = 0
+                bucket[3] = None
+            elif force or now - bucket[1] >= self._idle:
+                del self._buckets[key]
+        return summaries
+
+    def _emit_summaries(self, summaries):
+        if self._emit is None:
+            return
+        for record, count in summaries:
+            summary = logging.makeLogRecord(record.__dict__)
+            summary.msg = "%s (repeated %d times)"
+            summary.args = (record.getMessage(), count)
+            summary.exc_info = None
+            summary.exc_text = None
+            summary.repeated = count
+            self._emit(summary)
+
+    def flush(self):
+        """Emit the summaries of all the dropped records now."""
+        with self._lock:
+            summaries = self._collect(time.monotonic())
+        self._emit_summaries(summaries)
+
+    def _next_flush(self):
+        """Return the end of the window if records were dropped in it, for the flusher thread."""
+        return self._next_summary if self._dropped else None
+
+    def _after_fork(self):
+        """Forget the records dropped in the parent, which summarizes them, in a forked child."""
+        self._lock = threading.Lock()
+        for bucket in self._buckets.values():
+            bucket[2] = 0
+            bucket[3] = None
+        self._dropped = 0
+
+
+# Attributes of a record kept by the flight recorder, enough to format it.
+_FLIGHT_FIELDS = (
+    "name",
+    "msg",
+    "args",
+    "levelname",
+    "levelno",
+    "module",
+    "funcName",
+    "lineno",
+    "created",
+    "msecs",
+    "thread",
+    "threadName",
+    "exc_text",
+)
+_flight_entry = attrgetter(*_FLIGHT_FIELDS)
+_FLIGHT_LEVEL = _FLIGHT_FIELDS.index("levelno")
+_FLIGHT_CREATED = _FLIGHT_FIELDS.index("created")
+
+
+class _Ring:
+    """Preallocated slots keeping the last entries."""
+
+    __slots__ = ("slots", "count")
+
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.count = 0
+
+    def append(self, entry):
+        self.slots[self.count % len(self.slots)] = entry
+        self.count += 1
+
+    def take(self):
+        """Return the entries from the oldest to the newest and empty the ring."""
+        capacity = len(self.slots)
+        if self.count <= capacity:
+            entries = self.slots[: self.count]
+        else:
+            start = self.count % capacity
+            entries = self.slots[start:] + self.slots[:start]
+        self.slots[:] = [None] * capacity
+        self.count = 0
+        return entries
+
+
+class PyAnsysFlightRecorder(logging.Handler):
+    """Keep the last records in memory and write them when an error is logged.
+
+    Records of all levels are kept without being formatted, in rings of
+    preallocated slots: one shared by all the loggers, and one for each
+    logger given its own capacity with :meth:`set_capacity`. When a record
+    reaches ``dump_level``, the records of its ring are written to
+    ``target`` from the oldest to the newest, and the ring is emptied. The
+    records reaching the level of ``target`` are not written again.
+
+    Only the attributes needed to format a record are kept. The arguments
+    of the message are kept as they are, so their later changes show in
+    the written records.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Number of records kept by the shared ring. The default is
+        ``FLIGHT_RECORDER_CAPACITY``.
+    dump_level : int, optional
+        Minimum level of the records writing the ring. The default is
+        ``logging.ERROR``.
+    target : logging.Handler, optional
+        Handler writing the records. The default is ``None``, in which case
+        the records are only kept.
+    close_target : bool, optional
+        Close ``target`` with this handler. The default is ``False``.
+    """
+
+    def __init__(
+        self,
+        capacity=FLIGHT_RECORDER_CAPACITY,
+        dump_level=logging.ERROR,
+        target=None,
+        close_target=False,
+    ):
+        super().__init__()
+        self.capacity = capacity
+        self.dump_level = dump_level
+        self.target = target
+        self.close_target = close_target
+        self._shared = _Ring(capacity)
+        self._rings = {}
+        _FLIGHT_RECORDERS.add(self)
+
+    def set_capacity(self, name, capacity):
+        """Keep the records of the ``name`` logger in a ring of their own."""
+        self.acquire()
+        try:
+            self._rings[name] = _Ring(capacity)
+        finally:
+            self.release()
+
+    def forget(self, name):
+        """Drop the ring of the ``name`` logger, if any."""
+        self.acquire()
+        try:
+            self._rings.pop(name, None)
+        finally:
+            self.release()
+
+    def emit(self, record):
+        """Keep the record, or write its ring if it reaches ``dump_level``."""
+        try:
+            ring = self._rings.get(record.name, self._shared)
+            if record.levelno >= self.dump_level:
+                self._write(ring.take(), record)
+                return
+            if record.exc_info and not record.exc_text:
+                # The traceback would keep all its frames alive.
+                record.exc_text = _MESSAGE_FORMATTER.formatException(record.exc_info)
+            ring.append((*_flight_entry(record), getattr(record, "instance_name", "")))
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def dump(self):
+        """Write the records of all the rings, merged in time order."""
+        self.acquire()
+        try:
+            entries = self._shared.take()
+            for ring in self._rings.values():
+                entries.extend(ring.take())
+            entries.sort(key=itemgetter(_FLIGHT_CREATED))
+            self._write(entries)
+        finally:
+            self.release()
+
+    def _write(self, entries, trigger=None):
+        target = self.target
+        if target is None:
+            return
+        records = []
+        for entry in entries:
+            if entry[_FLIGHT_LEVEL] < target.level:
+                attributes = dict(zip(_FLIGHT_FIELDS, entry))
+                attributes["instance_name"] = entry[-1]
+                records.append(logging.makeLogRecord(attributes))
+        if not records:
+            return
+        if trigger is None:
+            marker = logging.makeLogRecord({"levelname": "INFO", "levelno": INFO, "funcName": ""})
+        else:
+            marker = logging.makeLogRecord(trigger.__dict__)
+            marker.exc_info = marker.exc_text = marker.stack_info = None
+        marker.msg = "Flight recorder: last %d records"
+        marker.args = (len(records),)
+        # Written whatever their level, like the error they lead to.
+        for record in [marker, *records]:
+            target.handle(record)
+
+    def close(self):
+        """Drop the records, and close the target if ``close_target``."""
+        self.acquire()
+        try:
+            self._shared = _Ring(self.capacity)
+            self._rings = {}
+            if self.close_target and self.target is not None:
+                self.target.close()
+        finally:
+            self.release()
+        _FLIGHT_RECORDERS.discard(self)
+        super().close()
+
+    def _after_fork(self):
+        """Drop the records kept in the parent, which writes them, in a forked child."""
+        self._shared = _Ring(self.capacity)
+        self._rings = {name: _Ring(len(ring.slots)) for name, ring in self._rings.items()}
+
+
+# Flight recorders, whose rings are emptied in a forked child.
+_FLIGHT_RECORDERS = weakref.WeakSet()
+
+
+# Histogram buckets: four per power of two, so a percentile is known within 25 %.
+_SUB_BUCKET_BITS = 2
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_HISTOGRAM_BUCKETS = 64 * _SUB_BUCKETS
+
+
+def _bucket_index(value):
+    """Return the bucket of a non-negative integer."""
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - 1 - _SUB_BUCKET_BITS
+    return (shift + 1) * _SUB_BUCKETS + ((value >> shift) & (_SUB_BUCKETS - 1))
+
+
+def _bucket_upper_bound(index):
+    """Return the smallest integer above the bucket."""
+    if index < _SUB_BUCKETS:
+        return index + 1
+    shift = index // _SUB_BUCKETS - 1
+    return (_SUB_BUCKETS + index % _SUB_BUCKETS + 1) << shift
+
+
+class LatencyHistogram:
+    """Histogram of durations in nanoseconds with fixed buckets.
+
+    Each power of two is split in four buckets, so the percentiles are
+    exact within 25 %, with a fixed memory footprint.
+    """
+
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.counts = [0] * _HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, duration):
+        """Add a duration in nanoseconds."""
+        self.counts[_bucket_index(duration)] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the ``fraction`` percentile."""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(_bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Return the count, and the mean, percentiles, and maximum in nanoseconds."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+# Start times of the spans entered in the current thread or task, innermost
+# last. They are not kept on the spans, which can be nested or shared.
+_span_starts = contextvars.ContextVar("pyansys_logging_span_starts", default=())
+
+
+class Span:
+    """Measure an operation as a context manager or as a decorator.
+
+    Create it with :meth:`SpanRecorder.span`.
+    """
+
+    __slots__ = ("_recorder", "name", "instance_name")
+
+    def __init__(self, recorder, name, instance_name):
+        self._recorder = recorder
+        self.name = name
+        self.instance_name = instance_name
+
+    def __enter__(self):
+        """Start measuring."""
+        _span_starts.set((*_span_starts.get(), time.perf_counter_ns()))
+        return self
+
+    def __exit__(self, *exc_info):
+        """Record the duration, even if the operation failed."""
+        end = time.perf_counter_ns()
+        starts = _span_starts.get()
+        _span_starts.set(starts[:-1])
+        # The line of the ``with`` statement.
+        caller = sys._getframe(1)
+        location = (caller.f_code.co_filename, caller.f_lineno, caller.f_code.co_name)
+        self._recorder.record(self.name, self.instance_name, end - starts[-1], location)
+
+    def __call__(self, function):
+        """Measure each call of a function."""
+        recorder, name, instance_name = self._recorder, self.name, self.instance_name
+        code = function.__code__
+        location = (code.co_filename, code.co_firstlineno, function.__name__)
+
+        @functools.wraps(function)
+        def measured(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.record(name, instance_name, time.perf_counter_ns() - start, location)
+
+        return measured
+
+
+class SpanRecorder:
+    """Collect the durations of operations and log their summaries.
+
+    The durations are grouped by instance name and operation in
+    :class:`LatencyHistogram` objects. Every ``interval`` seconds, one
+    summary record per group is logged and new histograms start. The
+    summaries are logged by the span that ends the interval, or by the
+    flusher thread of the buffered handlers if no span follows. Each
+    summary record has the file, line, and function of the first span of
+    its group.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        Logger of the summary records.
+    interval : float, optional
+        Time in seconds between two summaries. The default is ``60.0``.
+    level : int, optional
+        Level of the summary records. The default is ``logging.INFO``.
+    """
+
+    def __init__(self, logger, interval=60.0, level=logging.INFO):
+        """Initialize the recorder without histograms."""
+        self.logger = logger
+        self.interval = interval
+        self.level = level
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._next_summary = time.monotonic() + interval
+
+    def span(self, name, instance_name=""):
+        """Return a span measuring the ``name`` operation.
+
+        Parameters
+        ----------
+        name : str
+            Name of the operation.
+        instance_name : str, optional
+            Name of the product instance. The default is ``""``.
+
+        Returns
+        -------
+        Span
+            Context manager and decorator measuring the operation.
+        """
+        return Span(self, name, instance_name)
+
+    def record(self, name, instance_name, duration, location=None):
+        """Add a duration in nanoseconds to the histogram of an operation.
+
+        ``location`` is the file name, line number, and function name of
+        the operation, given to its summary record.
+        """
+        key = (instance_name, name)
+        summaries = None
+        scheduled = False
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                # The first span of an interval schedules its summaries.
+                scheduled = not self._histograms
+                entry = self._histograms[key] = (LatencyHistogram(), location)
+            entry[0].record(duration)
+            now = time.monotonic()
+            if now >= self._next_summary:
+                summaries = self._take(now)
+                scheduled = False
+        if scheduled:
+            _register_buffered_handler(self)
+            _flusher_wakeup.set()
+        if summaries:
+            self._log(summaries)
+
+    def _take(self, now):
+        self._next_summary = now + self.interval
+        histograms, self._histograms = self._histograms, {}
+        return histograms
+
+    def _log(self, histograms):
+        if not histograms or not self.logger.isEnabledFor(self.level):
+            return
+        for (instance_name, name), (histogram, location) in histograms.items():
+            summary = histogram.summary()
+            pathname, lineno, func = location or ("", 0, None)
+            record = self.logger.makeRecord(
+                self.logger.name,
+                self.level,
+                pathname,
+                lineno,
+                "Span %s: %d calls, mean %.3f ms, p50 %.3f ms, p95 %.3f ms, p99 %.3f ms,"
+                " max %.3f ms",
+                (
+                    name,
+                    summary["count"],
+                    summary["mean"] / 1e6,
+                    summary["p50"] / 1e6,
+                    summary["p95"] / 1e6,
+                    summary["p99"] / 1e6,
+                    summary["max"] / 1e6,
+                ),
+                None,
+                func,
+                {"instance_name": instance_name},
+            )
+            self.logger.handle(record)
+
+    def flush(self):
+        """Log the summaries of the current histograms now."""
+        with self._lock:
+            histograms = self._take(time.monotonic())
+        self._log(histograms)
+
+    def _next_flush(self):
+        """Return the end of the interval if spans were recorded in it, for the flusher thread."""
+        return self._next_summary if self._histograms else None
+
+    def _after_fork(self):
+        """Drop the durations recorded in the parent, which summarizes them, in a forked child."""
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+
+class PyAnsysProcessHandler(logging.Handler):
+    """Forward the records of a worker process to the listener of its parent.
+
+    The records are sent with their message merged and their traceback
+    formatted, over an authenticated local connection opened at the first
+    record.
+
+    Parameters
+    ----------
+    address : str or tuple
+        Address of the :class:`PyAnsysProcessListener`.
+    """
+
+    def __init__(self, address):
+        """Initialize the handler without connecting yet."""
+        super().__init__()
+        self.address = address
+        self._connection = None
+
+    def emit(self, record):
+        """Send the attributes of the record to the listener."""
+        try:
+            if self._connection is None:
+                import multiprocessing.connection
+
+                self._connection = multiprocessing.connection.Client(
+                    self.address, authkey=multiprocessing.current_process().authkey
+                )
+            attributes = dict(record.__dict__)
+            attributes["msg"] = record.getMessage()
+            attributes["args"] = None
+            if record.exc_info and not record.exc_text:
+                attributes["exc_text"] = _MESSAGE_FORMATTER.formatException(record.exc_info)
+            attributes["exc_info"] = None
+            self._connection.send(attributes)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        """Close the connection to the listener."""
+        self.acquire()
+        try:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        finally:
+            self.release()
+        super().close()
+
+
+class PyAnsysProcessListener:
+    """Receive the records of worker processes and handle them with a logger.
+
+    Each worker connects to a local socket, authenticated with the key of
+    the parent process, and is served by its own thread. A worker that
+    crashes only closes its connection, and a record it was sending is
+    discarded.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        Logger handling the records, usually ``pyproject_global``.
+    """
+
+    def __init__(self, logger):
+        """Listen on a local socket and start accepting workers."""
+        import multiprocessing.connection
+
+        self.logger = logger
+        self._authkey = multiprocessing.current_process().authkey
+        self._listener = multiprocessing.connection.Listener(authkey=self._authkey)
+        self.address = self._listener.address
+        self._connections = []
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._accept, name="pyansys_logging_listener", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def initargs(self):
+        """Arguments of :func:`worker_initializer` for this listener."""
+        return (self.address,)
+
+    def _accept(self):
+        import multiprocessing
+
+        while True:
+            try:
+                connection = self._listener.accept()
+            except multiprocessing.AuthenticationError:
+                continue
+            except OSError:
+                return
+            if self._closed:
+                connection.close()
+                return
+            thread = threading.Thread(
+                target=self._receive, args=(connection,), name="pyansys_logging_worker", daemon=True
+            )
+            # Forget the workers that exited, such as the ones of previous pools.
+            self._connections = [each for each in self._connections if each.is_alive()]
+            self._connections.append(thread)
+            thread.start()
+
+    def _receive(self, connection):
+        with connection:
+            while True:
+                try:
+                    attributes = connection.recv()
+                except (EOFError, OSError):
+                    return  # The worker exited or crashed.
+                except Exception:
+                    # Truncated or unreadable record.
+                    if logging.raiseExceptions:
+                        traceback.print_exc()
+                    continue
+                self.logger.handle(logging.makeLogRecord(attributes))
+
+    def stop(self, timeout=5.0):
+        """Stop accepting workers and wait for the connected ones to exit.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time in seconds to wait for each connected worker. The
+            default is ``5.0``.
+        """
+        import multiprocessing.connection
+
+        if self._closed:
+            return
+        self._closed = True
+        # Wake up the thread waiting for a new worker.
+        multiprocessing.connection.Client(self.address, authkey=self._authkey).close()
+        self._thread.join()
+        self._listener.close()
+        for thread in self._connections:
+            thread.join(timeout)
+
+
+# Handler of the worker processes set up by ``worker_initializer``.
+_process_handler = None
+
+
+def worker_initializer(address, level=logging.DEBUG):
+    """Forward the records of this worker process to the listener of its parent.
+
+    Use it as the ``initializer`` of a process pool, with the ``initargs``
+    of the listener returned by :meth:`Logger.start_process_listener`. The
+    ``Logger`` objects created in the worker then send their records to the
+    parent instead of opening the log file.
+
+    Parameters
+    ----------
+    address : str or tuple
+        Address of the listener.
+    level : int, optional
+        Level of the forwarded records. The default is ``logging.DEBUG``.
+    """
+    global _process_handler
+    logger = _get_logger("pyproject_global")
+    # Forked workers inherit the handlers of the parent. They are removed
+    # without being closed, which would flush the parent buffers again.
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    _process_handler = PyAnsysProcessHandler(address)
+    _process_handler.setLevel(level)
+    logger.addHandler(_process_handler)
+
+
+class PyAnsysNetworkHandler(logging.Handler):
+    """Ship the records to a log collector in compressed batches.
+
+    The records are formatted as JSON Lines and added to a batch, which is
+    handed to the senders when it holds ``batch_size`` bytes, when its
+    first record is older than ``flush_interval``, or when a record reaches
+    ``flush_level``. Each of the ``connections`` sender threads keeps its
+    own connection to the collector open, and reconnects after errors.
+
+    Each batch is sent as a frame: a header with the size of the payload,
+    the number of the batch, and flags, followed by the JSON Lines,
+    compressed with zlib if ``compress``. Frames can be read with
+    :func:`read_shipped_batches`. The batches are sent at least once, but
+    the connections can deliver them out of order.
+
+    At most ``max_batches`` batches wait for the senders. When the collector
+    lags and none is free, the logging calls wait up to ``timeout`` for the
+    senders, then drop the batch. With a ``spill_filename``, the batch is
+    appended to this file instead, as are the batches the collector does
+    not accept. The spilled batches are sent again once the collector
+    catches up.
+
+    Parameters
+    ----------
+    address : tuple or str
+        Host and port of a TCP collector, or path of a Unix socket.
+    batch_size : int, optional
+        Number of bytes in a batch. The default is ``BUFFER_SIZE``.
+    flush_interval : float, optional
+        Maximum time in seconds a record stays in the batch. The default is
+        ``1.0``.
+    flush_level : int, optional
+        Minimum level of the records sent immediately, with the rest of the
+        batch. The default is ``logging.ERROR``.
+    connections : int, optional
+        Number of connections to the collector. The default is ``2``.
+    compress : bool, optional
+        Compress the batches. The default is ``True``.
+    max_batches : int, optional
+        Maximum number of batches waiting for the senders. The default is
+        ``SHIP_MAX_BATCHES``.
+    spill_filename : str, optional
+        File where the batches are kept while the collector lags. The
+        default is ``None``, in which case they are dropped.
+    timeout : float, optional
+        Time in seconds to connect and send a batch, and to wait for a free
+        place for a batch. The default is ``5.0``.
+    """
+
+    def __init__(
+        self,
+        address,
+        batch_size=BUFFER_SIZE,
+        flush_interval=1.0,
+        flush_level=logging.ERROR,
+        connections=2,
+        compress=True,
+        max_batches=SHIP_MAX_BATCHES,
+        spill_filename=None,
+        timeout=5.0,
+    ):
+        """Initialize the handler, which connects at the first batch."""
+        super().__init__()
+        self.setFormatter(JsonLinesFormatter())
+        self.address = address if isinstance(address, str) else tuple(address)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.connections = connections
+        self.compress = compress
+        self.max_batches = max_batches
+        self.spill_filename = spill_filename
+        self.timeout = timeout
+        self.dropped_batches = 0
+        self._buffer = []
+        self._buffered = 0
+        self._flush_at = None  # Deadline of the first record of the batch.
+        self._number = 0
+        self._frames = collections.deque()
+        self._frames_lock = threading.Lock()
+        self._not_empty = threading.Condition(self._frames_lock)
+        self._not_full = threading.Condition(self._frames_lock)
+        self._senders = []
+        self._closing = False
+        self._spill_lock = threading.Lock()
+        self._spilled = False
+        self._sending_spilled = False
+
+    def emit(self, record):
+        """Add the record to the batch and ship the batch if a threshold is reached."""
+        try:
+            data = (self.format(record) + "\n").encode("utf-8")
+            self._buffer.append(data)
+            self._buffered += len(data)
+            if self._flush_at is None:
+                self._flush_at = time.monotonic() + self.flush_interval
+                # Shipped by the flusher thread of the buffered files when it expires.
+                _register_buffered_handler(self)
+                _flusher_wakeup.set()
+            if self._buffered >= self.batch_size or record.levelno >= self.flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Hand the batch to the senders, without waiting for it to be sent."""
+        self.acquire()
+        try:
+            if not self._buffer:
+                return
+            payload = b"".join(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+            self._flush_at = None
+            flags = 0
+            if self.compress:
+                payload = zlib.compress(payload, 1)
+                flags = _SHIP_COMPRESSED
+            self._number += 1
+            self._ship(_SHIP_FRAME.pack(len(payload), self._number, flags) + payload)
+        finally:
+            self.release()
+
+    def _next_flush(self):
+        """Return the time the batch expires, if any."""
+        return self._flush_at
+
+    def _ship(self, frame):
+        if not self._senders:
+            for index in range(self.connections):
+                sender = threading.Thread(
+                    target=self._send_frames, name=f"pyansys_logging_sender_{index}", daemon=True
+                )
+                self._senders.append(sender)
+                sender.start()
+        with self._not_full:
+            if len(self._frames) >= self.max_batches:
+                if self.spill_filename is not None:
+                    self._spill(frame)
+                    return
+                # Backpressure: the caller waits for the senders.
+                self._not_full.wait_for(
+                    lambda: len(self._frames) < self.max_batches or self._closing, self.timeout
+                )
+                if len(self._frames) >= self.max_batches:
+                    self.dropped_batches += 1
+                    return
+            self._frames.append(frame)
+            self._not_empty.notify()
+
+    def _send_frames(self):
+        connection = None
+        failures = 0
+        while True:
+            with self._not_empty:
+                self._not_empty.wait_for(lambda: self._frames or self._closing)
+                if not self._frames:
+                    break
+                frame = self._frames.popleft()
+                self._not_full.notify()
+            try:
+                if connection is None:
+                    connection = self._connect()
+                connection.sendall(frame)
+                frame = None
+                if self._spilled and not self._frames:
+                    self._send_spilled(connection)
+                failures = 0
+            except OSError:
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                if frame is not None:
+                    self._keep(frame)
+                if self._closing:
+                    break
+                # Wait longer after each failure, up to the timeout.
+                failures += 1
+                time.sleep(min(0.05 * 2**failures, self.timeout))
+        if connection is not None:
+            connection.close()
+
+    def _keep(self, frame):
+        """Spill a batch that was not sent, or put it back to be sent first."""
+        if self.spill_filename is not None:
+            self._spill(frame)
+        else:
+            with self._not_full:
+                self._frames.appendleft(frame)
+                self._not_empty.notify()
+
+    def _connect(self):
+        import socket
+
+        if isinstance(self.address, str):
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            try:
+                connection.connect(self.address)
+            except OSError:
+                connection.close()
+                raise
+        else:
+            connection = socket.create_connection(self.address, self.timeout)
+        return connection
+
+    def _spill(self, frame):
+        from pathlib import Path
 
-    def setLevel(self, level="DEBUG"):
-        """Change the log level of the object and the attached handlers."""
-        self.logger.setLevel(level)
-        for each_handler in self.logger.handlers:
-            each_handler.setLevel(level)
-        self.level = level
+        with self._spill_lock:
+            with Path(self.spill_filename).open("ab") as stream:
+                stream.write(frame)
+            self._spilled = True
 
+    def _send_spilled(self, connection):
+        """Send the spilled batches.
 
-class PyAnsysPercentStyle(logging.PercentStyle):
-    """Log message formatting."""
+        The spill file is swapped for an empty one under the lock and sent
+        outside of it, so the logging calls spilling new batches never wait
+        for the collector. One sender at a time sends them, until the spill
+        file stays empty. The batches that could not be sent are spilled
+        again, before the newer ones.
+        """
+        from pathlib import Path
 
-    def __init__(self, fmt, *, defaults=None):
-        self._fmt = fmt or self.default_format
-        self._defaults = defaults
+        spill = Path(self.spill_filename)
+        sending = Path(self.spill_filename + ".sending")
+        with self._spill_lock:
+            if not self._spilled or self._sending_spilled:
+                return  # Nothing spilled, or sent by another sender.
+            self._sending_spilled = True
+        try:
+            while True:
+                with self._spill_lock:
+                    if not self._spilled:
+                        self._sending_spilled = False
+                        return
+                    spill.replace(sending)
+                    spill.touch()
+                    self._spilled = False
+                try:
+                    self._send_file(connection, sending)
+                finally:
+                    sending.unlink()
+        except BaseException:
+            with self._spill_lock:
+                self._sending_spilled = False
+            raise
 
-    def _format(self, record):
-        defaults = self._defaults
-        if defaults:
-            values = defaults | record.__dict__
-        else:
-            values = record.__dict__
+    def _send_file(self, connection, sending):
+        """Send the batches of a swapped spill file, or spill them again."""
+        from pathlib import Path
+        import shutil
 
-        # Here you can make any changes that you want in the record. For
-        # example, adding a key.
+        with sending.open("rb") as stream:
+            frame = b""
+            try:
+                while True:
+                    header = stream.read(_SHIP_FRAME.size)
+                    if not header:
+                        break
+                    frame = header + stream.read(_SHIP_FRAME.unpack(header)[0])
+                    connection.sendall(frame)
+            except OSError:
+                with self._spill_lock:
+                    spill = Path(self.spill_filename)
+                    pending = Path(self.spill_filename + ".pending")
+                    with pending.open("wb") as destination:
+                        destination.write(frame)
+                        shutil.copyfileobj(stream, destination)
+                        with spill.open("rb") as newer:
+                            shutil.copyfileobj(newer, destination)
+                    pending.replace(spill)
+                    self._spilled = True
+                raise
 
-        # You could create an ``if`` here if you want conditional formatting, and even
-        # change the record.__dict__.
-        # If you don't want to create conditional fields, it is fine to keep
-        # the same MSG_FORMAT for all of them.
+    def close(self, timeout=None):
+        """Ship the last batch, and wait for the senders to send the waiting batches.
 
-        # For the case of logging exceptions to the logger.
-        values.setdefault("instance_name", "")
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time in seconds to wait for each sender. The default is
+            ``None``, in which case it is ``timeout``.
+        """
+        self.acquire()
+        try:
+            _BUFFERED_HANDLERS.discard(self)
+            self.flush()
+            with self._frames_lock:
+                self._closing = True
+                self._not_empty.notify_all()
+                self._not_full.notify_all()
+            for sender in self._senders:
+                sender.join(self.timeout if timeout is None else timeout)
+            self._senders.clear()
+            with self._frames_lock:
+                # Left by senders that failed while closing.
+                frames = list(self._frames)
+                self._frames.clear()
+            if self.spill_filename is not None:
+                for frame in frames:
+                    self._spill(frame)
+            else:
+                self.dropped_batches += len(frames)
+            super().close()
+        finally:
+            self.release()
 
-        return STDOUT_MSG_FORMAT % values
+    def _after_fork(self):
+        """Drop the batches of the parent, which ships them, in a forked child.
 
+        The sender threads start again with the next batch. The spilled
+        batches are left to the parent.
+        """
+        self._buffer = []
+        self._buffered = 0
+        self._flush_at = None
+        self._frames = collections.deque()
+        self._frames_lock = threading.Lock()
+        self._not_empty = threading.Condition(self._frames_lock)
+        self._not_full = threading.Condition(self._frames_lock)
+        self._senders = []
+        self._spill_lock = threading.Lock()
+        self._spilled = False
+        self._sending_spilled = False
 
-class PyProjectFormatter(logging.Formatter):
-    """Customized ``Formatter`` class used to overwrite the defaults format styles."""
 
-    def __init__(
-        self,
-        fmt=STDOUT_MSG_FORMAT,
-        datefmt=None,
-        style="%",
-        validate=True,
-        defaults=None,
-    ):
-        if sys.version_info[1] < 8:
-            super().__init__(fmt, datefmt, style)
-        else:
-            # 3.8: The validate parameter was added
-            super().__init__(fmt, datefmt, style, validate)
-        self._style = PyAnsysPercentStyle(fmt, defaults=defaults)  # overwriting
+def read_shipped_batches(stream):
+    """Read the batches sent by a :class:`PyAnsysNetworkHandler`.
 
+    Parameters
+    ----------
+    stream : io.BufferedIOBase
+        Binary stream of frames, such as a spill file, or a connection of
+        a collector opened with ``socket.makefile("rb")``.
 
-class InstanceFilter(logging.Filter):
-    """Ensures that instance_name record always exists."""
+    Yields
+    ------
+    tuple[int, list[dict]]
+        Number of the batch and its records. The records have the fields of
+        :class:`JsonLinesFormatter`. It stops at the end of the stream, or
+        before a truncated frame.
+    """
+    import json
 
-    def filter(self, record):
-        """If record had no attribute instance_name, create it and populate with empty string."""
-        if not hasattr(record, "instance_name"):
-            record.instance_name = ""
-        return True
+    while True:
+        header = stream.read(_SHIP_FRAME.size)
+        if len(header) < _SHIP_FRAME.size:
+            return
+        size, number, flags = _SHIP_FRAME.unpack(header)
+        payload = stream.read(size)
+        if len(payload) < size:
+            return
+        if flags & _SHIP_COMPRESSED:
+            payload = zlib.decompress(payload)
+        yield number, [json.loads(line) for line in payload.decode("utf-8").splitlines()]
 
 
 class Logger:
@@ -180,12 +3311,50 @@ class Logger:
     filename : str, optional
         Name of the file where log messages are written to.
         The default is ``None``.
+    cleanup : bool, optional
+        Close the handlers when the object is collected. The default
+        is ``True``.
+    asynchronous : bool, optional
+        Hand the records to a bounded queue and do the formatting and
+        the I/O on a background thread. The default is ``False``.
+    queue_size : int, optional
+        Maximum number of records waiting in the queue when ``asynchronous``
+        is ``True``. The default is ``QUEUE_SIZE``.
+    overflow : str, optional
+        Policy applied when the queue is full. Options are ``"block"``,
+        ``"drop_oldest"``, and ``"drop_new"``. The default is ``"block"``.
+    file_format : str, optional
+        Format of the log file: ``"text"``, ``"jsonl"``, or ``"binary"``.
+        The default is ``"text"``.
+    index : bool, optional
+        Write a sidecar index of the log file, which can be queried with
+        :class:`LogIndex`. The default is ``False``.
+    collect_stats : bool, optional
+        Count the records of the logger and its child and instance loggers,
+        and measure its handlers. See :meth:`stats`. The default is
+        ``False``.
+    compact_records : bool, optional
+        Create :class:`CompactLogRecord` records, which use less memory,
+        for the logger and its child and instance loggers. The default is
+        ``False``.
     """
 
     file_handler = None
     std_out_handler = None
+    network_handler = None
+    queue_handler = None
+    rate_limit_filter = None
+    process_listener = None
+    flight_recorder = None
+    collect_stats = False
+    _stats_dump = None
     _level = logging.DEBUG
-    _instances = {}
+    # Instance loggers are only kept while in use. When one is collected,
+    # its handlers are closed and its name is released.
+    _instances = weakref.WeakValueDictionary()
+    # Next index and number of live instance loggers for each requested name.
+    _name_counters = {}
+    _registry_lock = threading.RLock()
 
     def __init__(
         self,
@@ -194,14 +3363,37 @@ class Logger:
         to_stdout=True,
         filename=FILE_NAME,
         cleanup=True,
+        asynchronous=False,
+        queue_size=QUEUE_SIZE,
+        overflow="block",
+        file_format="text",
+        index=False,
+        collect_stats=False,
+        compact_records=False,
     ):
         """Initialize Logger class."""
-        self.logger = logging.getLogger("pyproject_global")  # Creating default main logger.
-        self.logger.addFilter(InstanceFilter())
+        self.logger = _get_logger("pyproject_global")  # Creating default main logger.
+        self.logger.compact_records = compact_records
+        # Shared with the child loggers, whose records the global filters
+        # do not see, like the ones of any logger below another.
+        self._instance_filter = InstanceFilter()
+        _add_filter(self.logger, self._instance_filter)
+        self.collect_stats = collect_stats
+        if collect_stats:
+            _count_records(self.logger)
         self.logger.setLevel(level)
         self.logger.propagate = True
         self.level = self.logger.level  # noqa: TD002, TD003 # TODO: TO REMOVE
 
+        # Single entry point for the records of all the child loggers.
+        self.shared_handler = PyAnsysFanInHandler(self.logger)
+        self.span_recorder = SpanRecorder(self.logger)
+
+        if asynchronous:
+            # Handlers added later are fed by this queue handler.
+            self.queue_handler = PyAnsysQueueHandler(maxsize=queue_size, overflow=overflow)
+            self.logger.addHandler(self.queue_handler)
+
         # Writing logging methods.
         self.debug = self.logger.debug
         self.info = self.logger.info
@@ -210,9 +3402,15 @@ class Logger:
         self.critical = self.logger.critical
         self.log = self.logger.log
 
+        if _process_handler is not None:
+            # In a worker process, the listener of the parent owns the handlers.
+            self.logger.addHandler(_process_handler)
+            to_file = to_stdout = False
+            filename = FILE_NAME
+
         if to_file or filename != FILE_NAME:
             # We record to file.
-            self.log_to_file(filename=filename, level=level)
+            self.log_to_file(filename=filename, level=level, file_format=file_format, index=index)
 
         if to_stdout:
             self.log_to_stdout(level=level)
@@ -223,7 +3421,7 @@ class Logger:
 
         self.cleanup = cleanup
 
-    def log_to_file(self, filename=FILE_NAME, level=LOG_LEVEL):
+    def log_to_file(self, filename=FILE_NAME, level=LOG_LEVEL, **kwargs):
         """Add file handler to logger.
 
         Parameters
@@ -232,8 +3430,18 @@ class Logger:
             Name of the file where the logs are recorded. By default FILE_NAME
         level : str, optional
             Level of logging. E.x. 'DEBUG'. By default LOG_LEVEL
+        **kwargs
+            Other arguments passed to :func:`add_file_handler`, such as
+            ``file_format`` or the rotation settings.
         """
-        self = add_file_handler(self, filename=filename, level=level, write_headers=True)
+        self = add_file_handler(
+            self,
+            filename=filename,
+            level=level,
+            write_headers=True,
+            asynchronous=self.queue_handler is not None,
+            **kwargs,
+        )
 
     def log_to_stdout(self, level=LOG_LEVEL):
         """Add standard output handler to the logger.
@@ -243,56 +3451,331 @@ class Logger:
         level : str, optional
             Level of logging record. By default LOG_LEVEL
         """
-        self = add_stdout_handler(self, level=level)
+        self = add_stdout_handler(self, level=level, asynchronous=self.queue_handler is not None)
+
+    def log_to_network(self, address, level=LOG_LEVEL, **kwargs):
+        """Add a handler shipping the records to a log collector.
+
+        Parameters
+        ----------
+        address : tuple or str
+            Host and port of a TCP collector, or path of a Unix socket.
+        level : str, optional
+            Level of logging record. By default LOG_LEVEL
+        **kwargs
+            Other arguments passed to :class:`PyAnsysNetworkHandler`, such as
+            ``batch_size`` or ``spill_filename``.
+        """
+        self = add_network_handler(
+            self, address, level=level, asynchronous=self.queue_handler is not None, **kwargs
+        )
 
     def setLevel(self, level="DEBUG"):
-        """Change the log level of the object and the attached handlers."""
-        self.logger.setLevel(level)
-        for each_handler in self.logger.handlers:
-            each_handler.setLevel(level)
+        """Change the log level of the object and the attached handlers.
+
+        The flight recorder keeps its level, which the logger level never
+        exceeds.
+        """
+        recorder = self.flight_recorder
+        if recorder is None:
+            self.logger.setLevel(level)
+        else:
+            level = logging._checkLevel(level)
+            self.logger.setLevel(min(level, recorder.level))
+        for each_handler in _iter_handlers(self.logger.handlers):
+            if each_handler is not recorder:
+                each_handler.setLevel(level)
         self._level = level
 
     def _make_child_logger(self, suffix, level):
         """Create a child logger.
 
-        Create a child logger either using ``getChild`` or copying
-        attributes between ``pyproject_global`` logger and the new
-        one.
-
+        The child logger routes its records to the handlers of the
+        ``pyproject_global`` logger through the shared handler, which applies
+        the level of the child logger if it is lower than the one of the
+        global handlers. Without its own level, the child logger follows the
+        level of the ``pyproject_global`` logger. The child logger propagates
+        its records, and it stamps them with the current :func:`log_context`
+        fields like the ``pyproject_global`` logger.
         """
-        logger = logging.getLogger(suffix)
-        logger.std_out_handler = None
-        logger.file_handler = None
-
-        if self.logger.hasHandlers:
-            for each_handler in self.logger.handlers:
-                new_handler = copy(each_handler)
-
-                if each_handler == self.file_handler:
-                    logger.file_handler = new_handler
-                elif each_handler == self.std_out_handler:
-                    logger.std_out_handler = new_handler
-
-                if level:
-                    # The logger handlers are copied and changed the
-                    # loglevel if the specified log level is lower
-                    # than the one of the global.
-                    if each_handler.level > string_to_loglevel[level.upper()]:
-                        new_handler.setLevel(level)
-
-                logger.addHandler(new_handler)
+        logger = _get_logger(suffix)
+        logger.std_out_handler = self.std_out_handler
+        logger.file_handler = self.file_handler
+        logger.shared_handler = self.shared_handler
+        logger.span_recorder = self.span_recorder
+        logger.flight_recorder = self.flight_recorder
+        logger.compact_records = self.logger.compact_records
+        logger.addHandler(self.shared_handler)
+        if self.collect_stats:
+            _count_records(logger)
+        _add_filter(logger, self._instance_filter)
+        if self.rate_limit_filter is not None:
+            _add_filter(logger, self.rate_limit_filter)
 
         if level:
             if isinstance(level, str):
                 level = string_to_loglevel[level.upper()]
             logger.setLevel(level)
+            self.shared_handler.set_level(logger.name, level)
+
+        elif isinstance(logger, PyAnsysLogger):
+            # Follows the later changes of the global level.
+            logger.setLevel(logging.NOTSET)
 
         else:
+            # Created before as a standard logger, so the level is copied.
             logger.setLevel(self.logger.level)
 
+        if isinstance(logger, PyAnsysLogger):
+            logger.level_parent = self.logger
+
+        # The shared handler does not pass the records that the propagation
+        # brings to the global handlers.
         logger.propagate = True
         return logger
 
+    def add_rate_limit(self, rate=1.0, burst=10, window=10.0):
+        """Limit the rate of repeated records of this logger and its children.
+
+        Records with the same instance name, level, and message template
+        are limited with a token bucket, and the dropped ones are reported
+        by periodic ``repeated N times`` records. See
+        :class:`RateLimitFilter`.
+
+        Parameters
+        ----------
+        rate : float, optional
+            Records per second allowed for each message once the burst is
+            spent. The default is ``1.0``.
+        burst : int, optional
+            Records allowed at once for each message. The default is ``10``.
+        window : float, optional
+            Time in seconds between the summaries of the dropped records.
+            The default is ``10.0``.
+
+        Returns
+        -------
+        RateLimitFilter
+            Filter added to the loggers.
+        """
+        self.rate_limit_filter = RateLimitFilter(rate, burst, window, emit=self.logger.handle)
+        _add_filter(self.logger, self.rate_limit_filter)
+        for each in list(self._instances.values()):
+            if isinstance(each, logging.LoggerAdapter):
+                each = each.logger
+            _add_filter(each, self.rate_limit_filter)
+        return self.rate_limit_filter
+
+    def add_flight_recorder(
+        self,
+        capacity=FLIGHT_RECORDER_CAPACITY,
+        level=logging.DEBUG,
+        dump_level=logging.ERROR,
+        filename=None,
+    ):
+        """Keep the last records of all levels and write them when an error is logged.
+
+        The logger level is lowered to ``level``, while the other handlers
+        keep theirs, so the records they filter out are still recorded. When
+        a record reaches ``dump_level``, or when an exception is not caught,
+        the recorded records are written before it. See
+        :class:`PyAnsysFlightRecorder`.
+
+        Parameters
+        ----------
+        capacity : int, optional
+            Number of records kept. The default is ``FLIGHT_RECORDER_CAPACITY``.
+            Instance loggers can keep their own with
+            :meth:`InstanceCustomAdapter.add_flight_recorder`.
+        level : int, optional
+            Minimum level of the recorded records. The default is
+            ``logging.DEBUG``.
+        dump_level : int, optional
+            Minimum level of the records writing the recorded ones. The
+            default is ``logging.ERROR``.
+        filename : str, optional
+            File where the records are written, created at the first
+            write. The default is ``None``, in which case they are written
+            by the file handler, or else the standard output handler.
+
+        Returns
+        -------
+        PyAnsysFlightRecorder
+            Handler recording the records.
+        """
+        if filename is not None:
+            target = PyAnsysFileHandler(filename, header=new_session_header() + DEFAULT_FILE_HEADER)
+            target.setFormatter(PyProjectFormatter(FILE_MSG_FORMAT))
+        else:
+            target = self.file_handler or self.std_out_handler
+        recorder = PyAnsysFlightRecorder(
+            capacity, dump_level, target=target, close_target=filename is not None
+        )
+        recorder.setLevel(level)
+        self.flight_recorder = recorder
+        with logging._lock:
+            # First, so the records leading to an error are written before it.
+            self.logger.handlers.insert(0, recorder)
+        if self.logger.level > level:
+            self.logger.setLevel(level)
+        for each in list(self._instances.values()):
+            if isinstance(each, logging.LoggerAdapter):
+                each = each.logger
+            if each.flight_recorder is None:
+                each.flight_recorder = recorder
+        return recorder
+
+    def ingest(self, chunks, instance_name="", level=logging.INFO, source="server"):
+        """Log a product log received as byte chunks, such as from a server.
+
+        The log is parsed with :func:`parse_remote_log` as the chunks
+        arrive, so it is never held in memory. The records completed by
+        each chunk are passed to the handlers in a single batch, which
+        takes each handler lock once, and writes once to the files and the
+        standard output.
+
+        Parameters
+        ----------
+        chunks : iterable[bytes]
+            Chunks of the UTF-8 log, split anywhere.
+        instance_name : str, optional
+            Name of the product instance in the records. The default is
+            ``""``. Instance loggers log the logs of their instance with
+            :meth:`InstanceCustomAdapter.ingest`.
+        level : int, optional
+            Level of the lines without level at the start of the log. The
+            default is ``logging.INFO``.
+        source : str, optional
+            Module of the records. The default is ``"server"``.
+
+        Returns
+        -------
+        int
+            Number of records logged.
+        """
+        return _ingest(self.logger, chunks, {"instance_name": instance_name}, level, source)
+
+    def start_process_listener(self):
+        """Handle the records of worker processes with this logger.
+
+        Pass :func:`worker_initializer` and the ``initargs`` of the returned
+        listener to the process pool. The ``Logger`` objects created in the
+        workers then forward their records, which are written by the
+        handlers of this logger only.
+
+        Returns
+        -------
+        PyAnsysProcessListener
+            Listener receiving the records of the workers.
+        """
+        if self.process_listener is None:
+            self.process_listener = PyAnsysProcessListener(self.logger)
+        return self.process_listener
+
+    def span(self, name):
+        """Measure the duration of an operation.
+
+        The durations are summarized periodically by the ``span_recorder``
+        of the logger, instead of one record per operation. See
+        :meth:`SpanRecorder.span`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the operation.
+
+        Returns
+        -------
+        Span
+            Context manager and decorator measuring the operation.
+        """
+        return self.span_recorder.span(name)
+
+    def stats(self):
+        """Return a snapshot of the logging counters.
+
+        The counters are only collected if the logger is created with
+        ``collect_stats=True``. They cover the records of this logger and
+        its live child and instance loggers. Calls below the level of a
+        logger are not counted.
+
+        Returns
+        -------
+        dict
+            Dictionary with these keys:
+
+            - ``"records"``: for each logger name and level, the number of
+              records ``"emitted"`` to the handlers and ``"filtered"`` out,
+              for example by the rate limit.
+            - ``"dropped"``: number of records discarded by the queue
+              handler when it was full.
+            - ``"handlers"``: for each file name or ``"stdout"``, the size
+              of the encoded records and line terminators in ``"bytes"``, and the time spent in
+              ``"format_seconds"`` and in the rest of ``"emit_seconds"``.
+        """
+        return _stats_snapshot(self.logger, _live_loggers(self.logger, self._instances))
+
+    def start_stats_dump(self, interval=60.0, level=logging.INFO):
+        """Log the :meth:`stats` snapshot periodically.
+
+        Parameters
+        ----------
+        interval : float, optional
+            Time in seconds between two snapshots. The default is ``60.0``.
+        level : int, optional
+            Level of the records with the snapshots. The default is
+            ``logging.INFO``.
+        """
+        self.stop_stats_dump()
+        stopped = threading.Event()
+        # The thread only references the logging logger, not this object.
+        thread = threading.Thread(
+            target=_dump_stats,
+            args=(self.logger, self._instances, interval, level, stopped),
+            name="pyansys_logging_stats",
+            daemon=True,
+        )
+        thread.start()
+        self._stats_dump = stopped
+
+    def stop_stats_dump(self):
+        """Stop logging the :meth:`stats` snapshot periodically."""
+        if self._stats_dump is not None:
+            self._stats_dump.set()
+            self._stats_dump = None
+
+    def _flush_handlers(self):
+        """Write the queued and buffered records of all the handlers."""
+        for handler in list(self.logger.handlers):
+            handler.flush()
+
+    def _close_handlers(self):
+        """Close and remove all the handlers, draining the queue handlers first."""
+        for handler in list(self.logger.handlers):
+            handler.close()
+            self.logger.removeHandler(handler)
+
+    async def drain(self):
+        """Wait until the pending records are written.
+
+        The handlers are flushed in a worker thread, so the event loop keeps
+        running the other tasks meanwhile.
+        """
+        import asyncio
+
+        await asyncio.to_thread(self._flush_handlers)
+
+    async def aclose(self):
+        """Write the pending records and close the handlers.
+
+        The handlers are closed in a worker thread, so the event loop keeps
+        running the other tasks meanwhile.
+        """
+        import asyncio
+
+        await self.drain()
+        await asyncio.to_thread(self._close_handlers)
+
     def add_child_logger(self, suffix, level=None):
         """Add a child logger to the main logger.
 
@@ -316,7 +3799,7 @@ class Logger:
             Logger class.
         """
         name = self.logger.name + "." + suffix
-        self._instances[name] = self._make_child_logger(self, name, level)
+        self._instances[name] = self._make_child_logger(name, level)
         return self._instances[name]
 
     def _add_product_instance_logger(self, name, product_instance, level):
@@ -324,7 +3807,7 @@ class Logger:
             instance_logger = InstanceCustomAdapter(
                 self._make_child_logger(name, level), product_instance
             )
-        elif isinstance(name, None):
+        elif name is None:
             instance_logger = InstanceCustomAdapter(
                 self._make_child_logger("NO_NAMED_YET", level), product_instance
             )
@@ -340,12 +3823,16 @@ class Logger:
         contextual information such as <product/service> instance
         name. This logger is returned and you can use it to log events
         as a normal logger. It is also stored in the ``_instances``
-        attribute.
+        attribute while it is in use.
+
+        If the name is already taken, a ``_<n>`` suffix is added to it.
+        When the instance logger is collected, its handlers are closed and
+        its name is released.
 
         Parameters
         ----------
         name : str
-            Name for the new logger
+            Name for the new logger. If it is ``None``, ``NO_NAMED_YET`` is used.
         product_instance : ansys.product.service.module.ProductClass
             Class instance. This must contain the attribute ``name``.
 
@@ -361,16 +3848,73 @@ class Logger:
         TypeError
             You can only input strings as ``name`` to this method.
         """
-        count_ = 0
-        new_name = name
-        while new_name in logging.root.manager.__dict__.keys():
-            count_ += 1
-            new_name = name + "_" + str(count_)
+        # Instance loggers without a name get their own ``NO_NAMED_YET_<n>`` name too.
+        if name is None:
+            name = "NO_NAMED_YET"
+        with self._registry_lock:
+            new_name = self._allocate_name(name) if isinstance(name, str) else name
+            instance_logger = self._add_product_instance_logger(new_name, product_instance, level)
+            self._instances[new_name] = instance_logger
 
-        self._instances[new_name] = self._add_product_instance_logger(
-            new_name, product_instance, level
+        # The callback must not reference the adapter, otherwise it is never collected.
+        weakref.finalize(
+            instance_logger,
+            Logger._release_instance_logger,
+            new_name,
+            name,
+            instance_logger.logger,
         )
-        return self._instances[new_name]
+        return instance_logger
+
+    @classmethod
+    def _allocate_name(cls, name):
+        """Return ``name`` or the first free ``name_<n>``, without probing the used ones."""
+        logger_dict = logging.root.manager.loggerDict
+        counter = cls._name_counters.setdefault(name, [0, 0])
+        new_name = name if counter[0] == 0 else f"{name}_{counter[0]}"
+        # Names taken by loggers created elsewhere are skipped once.
+        while new_name in logger_dict:
+            counter[0] += 1
+            new_name = f"{name}_{counter[0]}"
+        counter[0] += 1
+        counter[1] += 1
+        return new_name
+
+    @classmethod
+    def _release_instance_logger(cls, new_name, name, logger):
+        """Close the handlers of a collected instance logger and forget its name."""
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if handler is not logger.shared_handler:
+                handler.close()
+        logger.shared_handler.forget(new_name)
+        if logger.flight_recorder is not None:
+            logger.flight_recorder.forget(new_name)
+
+        # The finalizer can run in any thread, so the logger dictionary is
+        # changed under the lock of ``logging``, like ``Manager.getLogger`` does.
+        with cls._registry_lock, logging._lock:
+            logger_dict = logging.root.manager.loggerDict
+            logger_dict.pop(new_name, None)
+            # Names with dots, such as IP addresses, also left placeholders
+            # referencing the logger for each parent name.
+            dot = new_name.rfind(".")
+            while dot > 0:
+                parent_name = new_name[:dot]
+                placeholder = logger_dict.get(parent_name)
+                if isinstance(placeholder, logging.PlaceHolder):
+                    placeholder.loggerMap.pop(logger, None)
+                    if not placeholder.loggerMap:
+                        del logger_dict[parent_name]
+                dot = new_name.rfind(".", 0, dot)
+            cls._instances.pop(new_name, None)
+            # Only string names are counted by ``_allocate_name``.
+            counter = cls._name_counters.get(name) if isinstance(name, str) else None
+            if counter is not None:
+                counter[1] -= 1
+                if counter[1] == 0:
+                    # No logger uses the name anymore, so it can be given again.
+                    del cls._name_counters[name]
 
     def __getitem__(self, key):
         """Define custom KeyError message."""
@@ -386,29 +3930,63 @@ class Logger:
             if issubclass(exc_type, KeyboardInterrupt):
                 sys.__excepthook__(exc_type, exc_value, exc_traceback)
                 return
+            # The records of all the rings of the flight recorder lead to it.
+            for handler in logger.handlers:
+                if isinstance(handler, PyAnsysFlightRecorder):
+                    handler.dump()
             logger.critical("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
 
         sys.excepthook = handle_exception
 
     def __del__(self):
         """Close the logger and all its handlers."""
-        self.logger.debug("Collecting logger")
+        self.stop_stats_dump()
+        _BUFFERED_HANDLERS.discard(self.span_recorder)
+        self.span_recorder.flush()
+        if self.process_listener is not None:
+            self.process_listener.stop()
+        if self.rate_limit_filter is not None:
+            _BUFFERED_HANDLERS.discard(self.rate_limit_filter)
+            self.rate_limit_filter.flush()
+            self.logger.removeFilter(self.rate_limit_filter)
+        # Otherwise, a session without records would create its files for this one.
+        unopened = any(_unopened(handler) for handler in _iter_handlers(self.logger.handlers))
+        if not unopened:
+            self.logger.debug("Collecting logger")
         if self.cleanup:
             try:
-                for handler in self.logger.handlers:
-                    handler.close()
-                    self.logger.removeHandler(handler)
+                # Queue handlers drain their pending records before closing.
+                self._close_handlers()
             except Exception:
                 try:
                     if self.logger is not None:
                         self.logger.error("The logger was not deleted properly.")
                 except Exception:
                     pass
-        else:
+        elif not unopened:
             self.logger.debug("Collecting but not exiting due to 'cleanup = False'")
 
 
-def add_file_handler(logger, filename=FILE_NAME, level=LOG_LEVEL, write_headers=False):
+def add_file_handler(
+    logger,
+    filename=FILE_NAME,
+    level=LOG_LEVEL,
+    write_headers=False,
+    asynchronous=False,
+    max_bytes=0,
+    rotation_interval=0,
+    backup_count=0,
+    max_total_bytes=0,
+    compression="gzip",
+    file_format="text",
+    index=False,
+    buffer_size=0,
+    flush_interval=1.0,
+    flush_level=logging.ERROR,
+    fsync="never",
+    fsync_interval=5.0,
+    segment_size=0,
+):
     """Add a file handler to the input.
 
     Parameters
@@ -421,32 +3999,135 @@ def add_file_handler(logger, filename=FILE_NAME, level=LOG_LEVEL, write_headers=
         Level of log recording. By default LOG_LEVEL
     write_headers : bool, optional
         Record the headers to the file. By default ``False``.
+    asynchronous : bool, optional
+        Write to the file from a background thread fed by the queue handler
+        of the logger, which is created if needed. By default ``False``.
+    max_bytes : int, optional
+        Rotate the file when it reaches this size. By default ``0``, which
+        does not rotate on size.
+    rotation_interval : float, optional
+        Rotate the file after this time in seconds. By default ``0``, which
+        does not rotate on time.
+    backup_count : int, optional
+        Maximum number of rotated files kept. By default ``0``, which keeps
+        all of them.
+    max_total_bytes : int, optional
+        Maximum size of all the rotated files kept. By default ``0``, which
+        sets no limit.
+    compression : str, optional
+        Compression of the rotated files: ``"gzip"``, ``"bz2"``, ``"lzma"``,
+        or ``None``. By default ``"gzip"``.
+    file_format : str, optional
+        Format of the file: ``"text"`` for lines following ``FILE_MSG_FORMAT``,
+        ``"jsonl"`` for one JSON object per line, or ``"binary"`` for
+        length-prefixed binary frames. By default ``"text"``.
+    index : bool, optional
+        Write a sidecar index of the sessions and records, which can be
+        queried with :class:`LogIndex`. It is only supported for text and
+        JSON Lines files without rotation. By default ``False``.
+    buffer_size : int, optional
+        Write the records in batches of this number of bytes. Buffering is
+        only supported for text and JSON Lines files without rotation or
+        index. By default ``0``, in which case each record is written
+        immediately.
+    flush_interval : float, optional
+        Maximum time in seconds a record stays in the buffer. By default
+        ``1.0``.
+    flush_level : int, optional
+        Minimum level of the records written immediately, with the rest of
+        the buffer. By default ``logging.ERROR``.
+    fsync : str, optional
+        When the buffered file is synchronized to the disk: ``"never"``,
+        ``"periodic"``, or ``"flush"``. By default ``"never"``.
+    fsync_interval : float, optional
+        Time in seconds between synchronizations with the ``"periodic"``
+        policy. By default ``5.0``.
+    segment_size : int, optional
+        Copy the records into memory-mapped segments of this size, read with
+        :class:`SegmentReader`. Segments are only supported for text and
+        JSON Lines files without rotation, index, or buffering. By default
+        ``0``, in which case the records are written to a single file.
 
     Returns
     -------
     logger
         Return the logger or Logger object.
     """
-    file_handler = logging.FileHandler(filename)
+    if file_format not in FILE_FORMATS:
+        raise ValueError(
+            f"``file_format`` must be one of {', '.join(FILE_FORMATS)}, not '{file_format}'."
+        )
+
+    if file_format == "text":
+        header = new_session_header() + DEFAULT_FILE_HEADER
+        formatter = PyProjectFormatter(FILE_MSG_FORMAT)
+    else:
+        header = _json_session_header()
+        formatter = JsonLinesFormatter()
+
+    if file_format == "binary":
+        if max_bytes or rotation_interval or index or buffer_size or segment_size:
+            raise ValueError(
+                "Rotation, index, buffering, and segments are only supported for text and "
+                "JSON Lines files."
+            )
+        file_handler = PyAnsysBinaryFileHandler(filename, write_headers=write_headers)
+    elif segment_size:
+        if max_bytes or rotation_interval or index or buffer_size:
+            raise ValueError("Segments are not supported for rotated, indexed, or buffered files.")
+        file_handler = PyAnsysMappedFileHandler(
+            filename, segment_size=segment_size, header=header if write_headers else ""
+        )
+    elif buffer_size:
+        if max_bytes or rotation_interval or index:
+            raise ValueError("Buffering is not supported for rotated or indexed files.")
+        file_handler = PyAnsysBufferedFileHandler(
+            filename,
+            buffer_size=buffer_size,
+            flush_interval=flush_interval,
+            flush_level=flush_level,
+            fsync=fsync,
+            fsync_interval=fsync_interval,
+            header=header if write_headers else "",
+        )
+    elif index:
+        if max_bytes or rotation_interval:
+            raise ValueError("The index is not supported for rotated files.")
+        file_handler = PyAnsysIndexedFileHandler(filename)
+        if write_headers:
+            file_handler.write_session(header)
+    elif max_bytes or rotation_interval:
+        # Each new segment starts with the same headers.
+        file_handler = PyAnsysRotatingFileHandler(
+            filename,
+            max_bytes=max_bytes,
+            interval=rotation_interval,
+            backup_count=backup_count,
+            max_total_bytes=max_total_bytes,
+            compression=compression,
+            header=header if write_headers else "",
+        )
+    else:
+        file_handler = PyAnsysFileHandler(filename, header=header if write_headers else "")
     file_handler.setLevel(level)
-    file_handler.setFormatter(logging.Formatter(FILE_MSG_FORMAT))
+    file_handler.setFormatter(formatter)
+    if isinstance(logger, Logger) and logger.collect_stats:
+        _count_handler(file_handler)
 
     if isinstance(logger, Logger):
         logger.file_handler = file_handler
-        logger.logger.addHandler(file_handler)
+        queue_handler = _attach_handler(logger.logger, file_handler, asynchronous)
+        if queue_handler is not None:
+            logger.queue_handler = queue_handler
 
     elif isinstance(logger, logging.Logger):
         logger.file_handler = file_handler
-        logger.addHandler(file_handler)
-
-    if write_headers:
-        file_handler.stream.write(NEW_SESSION_HEADER)
-        file_handler.stream.write(DEFAULT_FILE_HEADER)
+        _attach_handler(logger, file_handler, asynchronous)
 
     return logger
 
 
-def add_stdout_handler(logger, level=LOG_LEVEL, write_headers=False):
+def add_stdout_handler(logger, level=LOG_LEVEL, write_headers=False, asynchronous=False):
     """Add a stream handler to the logger.
 
     Parameters
@@ -457,6 +4138,9 @@ def add_stdout_handler(logger, level=LOG_LEVEL, write_headers=False):
         Level of log recording. By default ``logging.DEBUG``.
     write_headers : bool, optional
         Record the headers to the stream. By default ``False``.
+    asynchronous : bool, optional
+        Write to the stream from a background thread fed by the queue handler
+        of the logger, which is created if needed. By default ``False``.
 
     Returns
     -------
@@ -466,15 +4150,404 @@ def add_stdout_handler(logger, level=LOG_LEVEL, write_headers=False):
     std_out_handler = logging.StreamHandler(sys.stdout)
     std_out_handler.setLevel(level)
     std_out_handler.setFormatter(PyProjectFormatter(STDOUT_MSG_FORMAT))
+    if isinstance(logger, Logger) and logger.collect_stats:
+        _count_handler(std_out_handler)
+
+    if write_headers:
+        std_out_handler.stream.write(DEFAULT_STDOUT_HEADER)
 
     if isinstance(logger, Logger):
         logger.std_out_handler = std_out_handler
-        logger.logger.addHandler(std_out_handler)
+        queue_handler = _attach_handler(logger.logger, std_out_handler, asynchronous)
+        if queue_handler is not None:
+            logger.queue_handler = queue_handler
 
     elif isinstance(logger, logging.Logger):
-        logger.addHandler(std_out_handler)
+        _attach_handler(logger, std_out_handler, asynchronous)
 
-    if write_headers:
-        std_out_handler.stream.write(DEFAULT_STDOUT_HEADER)
+    return logger
+
+
+def add_network_handler(logger, address, level=LOG_LEVEL, asynchronous=False, **kwargs):
+    """Add a handler shipping the records to a log collector.
+
+    Parameters
+    ----------
+    logger : logging.Logger or logging.Logger
+        Logger where to add the network handler.
+    address : tuple or str
+        Host and port of a TCP collector, or path of a Unix socket.
+    level : str, optional
+        Level of log recording. By default ``logging.DEBUG``.
+    asynchronous : bool, optional
+        Batch the records in a background thread fed by the queue handler
+        of the logger, which is created if needed. By default ``False``.
+    **kwargs
+        Other arguments passed to :class:`PyAnsysNetworkHandler`, such as
+        ``batch_size`` or ``spill_filename``.
+
+    Returns
+    -------
+    logger
+        The logger or Logger object.
+    """
+    network_handler = PyAnsysNetworkHandler(address, **kwargs)
+    network_handler.setLevel(level)
+    if isinstance(logger, Logger) and logger.collect_stats:
+        _count_handler(network_handler)
+
+    if isinstance(logger, Logger):
+        logger.network_handler = network_handler
+        queue_handler = _attach_handler(logger.logger, network_handler, asynchronous)
+        if queue_handler is not None:
+            logger.queue_handler = queue_handler
+
+    elif isinstance(logger, logging.Logger):
+        _attach_handler(logger, network_handler, asynchronous)
 
     return logger
+
+
+def read_records(filename, level=None, instance_name=None):
+    """Read the records of a JSON Lines or binary log file one at a time.
+
+    The file is streamed, so it is never loaded in memory as a whole.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file written with the ``"jsonl"`` or ``"binary"`` format.
+    level : int or str, optional
+        Minimum level of the records returned. By default ``None``, which
+        returns all of them.
+    instance_name : str, optional
+        Name of the instance whose records are returned. By default ``None``,
+        which returns the records of all instances.
+
+    Yields
+    ------
+    dict
+        Record with the ``level``, ``instance_name``, ``module``,
+        ``funcName``, ``timestamp``, and ``message`` fields.
+    """
+    from pathlib import Path
+
+    if isinstance(level, str):
+        level = string_to_loglevel[level.upper()]
+
+    with Path(filename).open("rb") as stream:
+        if stream.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            records = _read_binary_records(stream, level, instance_name)
+        else:
+            stream.seek(0)
+            records = _read_json_records(stream, level, instance_name)
+        yield from records
+
+
+def _read_json_records(stream, level, instance_name):
+    import json
+
+    for line in stream:
+        record = json.loads(line)
+        if "level" not in record:
+            continue  # Session header.
+        if level is not None and logging.getLevelName(record["level"]) < level:
+            continue
+        if instance_name is not None and record["instance_name"] != instance_name:
+            continue
+        yield record
+
+
+def _read_binary_records(stream, level, instance_name):
+    header_size = _BINARY_FRAME.size
+    while True:
+        header = stream.read(header_size)
+        if len(header) < header_size:
+            return
+        size, kind, levelno, timestamp, *sizes = _BINARY_FRAME.unpack(header)
+        if kind != _RECORD_FRAME or (level is not None and levelno < level):
+            # Skipped without decoding its strings.
+            stream.seek(size + 4 - header_size, 1)
+            continue
+        strings = stream.read(sum(sizes))
+        fields = []
+        start = 0
+        for each in sizes:
+            fields.append(strings[start : start + each].decode("utf-8"))
+            start += each
+        if instance_name is not None and fields[0] != instance_name:
+            continue
+        yield {
+            "level": logging.getLevelName(levelno),
+            "instance_name": fields[0],
+            "module": fields[1],
+            "funcName": fields[2],
+            "timestamp": timestamp,
+            "message": fields[3],
+        }
+
+
+class LogIndex:
+    """Query a log file through its sidecar index.
+
+    The index and the log file are memory-mapped. The entries are read from
+    the index when they are needed, the first one of a time range is found
+    by bisection, and the matching records are read directly at their
+    offsets.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the text or JSON Lines log file.
+    rebuild : bool, optional
+        Build the index from the log file first, for example for a file
+        written without index. The default is ``False``.
+    """
+
+    def __init__(self, filename, rebuild=False):
+        import mmap
+        from pathlib import Path
+
+        self.filename = Path(filename)
+        if rebuild:
+            build_index(filename)
+
+        with Path(str(filename) + INDEX_SUFFIX).open("rb") as stream:
+            if stream.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{filename}{INDEX_SUFFIX} is not a log index.")
+            # The mapping stays valid once the file is closed.
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = (len(self._map) - len(INDEX_MAGIC)) // _INDEX_ENTRY.size
+        self._session_positions = None
+
+    def _entry(self, position):
+        return _INDEX_ENTRY.unpack_from(self._map, len(INDEX_MAGIC) + position * _INDEX_ENTRY.size)
+
+    def _latest(self, position):
+        return self._entry(position)[2]
+
+    def _sessions(self):
+        """Return the positions of the session entries, read once."""
+        if self._session_positions is None:
+            size = _INDEX_ENTRY.size
+            with memoryview(self._map) as view:
+                entries = view[len(INDEX_MAGIC) : len(INDEX_MAGIC) + self._count * size]
+                self._session_positions = [
+                    position
+                    for position, entry in enumerate(_INDEX_ENTRY.iter_unpack(entries))
+                    if entry[3] == _SESSION_FRAME
+                ]
+                entries.release()
+        return self._session_positions
+
+    def sessions(self):
+        """Return the start time and offset of each session.
+
+        Returns
+        -------
+        list[tuple[datetime.datetime, int]]
+            Start time and byte offset of each session, in file order.
+        """
+        from datetime import datetime
+
+        sessions = []
+        for position in self._sessions():
+            offset, timestamp = self._entry(position)[:2]
+            sessions.append((datetime.fromtimestamp(timestamp), offset))
+        return sessions
+
+    def records(self, level=None, instance_name=None, session=None, start=None, end=None):
+        """Read the records matching all the given criteria.
+
+        Parameters
+        ----------
+        level : int or str, optional
+            Minimum level of the records.
+        instance_name : str, optional
+            Name of the instance that logged the records.
+        session : int, optional
+            Position of the session in :meth:`sessions`. Negative values
+            count from the last session.
+        start, end : datetime.datetime, optional
+            Time range of the records.
+
+        Yields
+        ------
+        str
+            Text of each record, including its traceback if any.
+        """
+        import bisect
+        import mmap
+
+        if isinstance(level, str):
+            level = string_to_loglevel[level.upper()]
+        key = _instance_key(instance_name) if instance_name is not None else None
+        start = start.timestamp() if start is not None else None
+        end = end.timestamp() if end is not None else None
+
+        first, last = 0, self._count
+        if session is not None:
+            positions = self._sessions()
+            first = positions[session]
+            following = positions.index(first) + 1
+            last = positions[following] if following < len(positions) else self._count
+        if start is not None:
+            # The entries before have no record as recent as ``start``.
+            first = bisect.bisect_left(range(last), start, lo=first, key=self._latest)
+
+        with self.filename.open("rb") as stream:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for position in range(first, last):
+                    offset, timestamp, _, kind, levelno, entry_key = self._entry(position)
+                    if kind != _RECORD_FRAME:
+                        continue
+                    if level is not None and levelno < level:
+                        continue
+                    if key is not None and entry_key != key:
+                        continue
+                    if (start is not None and timestamp < start) or (
+                        end is not None and timestamp > end
+                    ):
+                        continue
+                    # A record ends where the next entry starts.
+                    if position + 1 < self._count:
+                        stop = self._entry(position + 1)[0]
+                    else:
+                        stop = len(data)
+                    text = data[offset:stop].decode("utf-8").rstrip("\n")
+                    if key is not None and _record_instance_name(text) != instance_name:
+                        continue  # Hash collision.
+                    yield text
+
+    def close(self):
+        """Release the mapping of the index."""
+        self._map.close()
+
+
+def _record_instance_name(text):
+    import json
+
+    if text.startswith("{"):
+        return json.loads(text)["instance_name"]
+    return text.split(" - ", 2)[1]
+
+
+def build_index(filename):
+    """Build the sidecar index of a text or JSON Lines log file.
+
+    Records of text files have no timestamp, so they are given the start
+    time of their session.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the log file.
+    """
+    from datetime import datetime
+    import json
+    from pathlib import Path
+
+    entries = []
+    lines = []  # Offsets of the last two lines, to find the start of a session header.
+    session_time = 0.0
+    with Path(filename).open("rb") as stream:
+        offset = 0
+        for line in stream:
+            text = line.decode("utf-8")
+            if text.startswith("{"):
+                record = json.loads(text)
+                if "session" in record:
+                    session_time = datetime.fromisoformat(record["session"]).timestamp()
+                    entries.append((offset, session_time, _SESSION_FRAME, 0, 0))
+                else:
+                    level = string_to_loglevel.get(record["level"], 0)
+                    key = _instance_key(record["instance_name"])
+                    entries.append((offset, record["timestamp"], _RECORD_FRAME, level, key))
+            elif "NEW SESSION - " in text:
+                stamp = text.split("NEW SESSION - ", 1)[1].strip()
+                session_time = datetime.strptime(stamp, "%m/%d/%Y, %H:%M:%S").timestamp()
+                # The header starts with an empty line and a line of ``=``.
+                session_offset = lines[0] if len(lines) == 2 else 0
+                entries.append((session_offset, session_time, _SESSION_FRAME, 0, 0))
+            else:
+                fields = text.split(" - ", 2)
+                if len(fields) == 3 and fields[0] in string_to_loglevel:
+                    level = string_to_loglevel[fields[0]]
+                    key = _instance_key(fields[1])
+                    entries.append((offset, session_time, _RECORD_FRAME, level, key))
+            lines = [*lines[-1:], offset]
+            offset += len(line)
+
+    with Path(str(filename) + INDEX_SUFFIX).open("wb") as index:
+        index.write(INDEX_MAGIC)
+        latest = 0.0
+        for offset, timestamp, kind, level, key in entries:
+            latest = max(latest, timestamp)
+            index.write(_INDEX_ENTRY.pack(offset, timestamp, latest, kind, level, key))
+
+
+class SegmentReader:
+    """Read the segments of a :class:`PyAnsysMappedFileHandler`, following the live one.
+
+    Each call to :meth:`read` returns the records written since the previous
+    one. The reader takes no lock: it reads the end of the written data in
+    the header of the segment, then the data up to it. It moves to the next
+    segment once the writer has started it, which happens after its last
+    write to the current one.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the log file given to the handler.
+    """
+
+    def __init__(self, filename):
+        """Start from the first existing segment."""
+        from pathlib import Path
+
+        self.filename = str(Path(filename).absolute())
+        numbers = _segment_numbers(self.filename)
+        self._number = numbers[0] if numbers else 1
+        self._offset = _SEGMENT_HEADER.size
+
+    def read(self):
+        """Return the text of the records written since the last call."""
+        chunks = []
+        while True:
+            path = _segment_path(self.filename, self._number)
+            # Checked first: once the next segment exists, this one is final.
+            finished = _segment_path(self.filename, self._number + 1).exists()
+            try:
+                with path.open("rb") as stream:
+                    header = stream.read(_SEGMENT_HEADER.size)
+                    magic, end = _SEGMENT_HEADER.unpack(header.ljust(_SEGMENT_HEADER.size, b"\0"))
+                    if magic not in (SEGMENT_MAGIC, bytes(len(SEGMENT_MAGIC))):
+                        raise ValueError(f"{path} is not a log segment.")
+                    # The header of a new segment may not be written yet.
+                    if end > self._offset:
+                        stream.seek(self._offset)
+                        chunks.append(stream.read(end - self._offset))
+                        self._offset = end
+            except FileNotFoundError:
+                pass
+            if not finished:
+                break
+            self._number += 1
+            self._offset = _SEGMENT_HEADER.size
+        return b"".join(chunks).decode("utf-8")
+
+    def follow(self, interval=0.1):
+        """Yield the lines of the records as they are written, forever.
+
+        Parameters
+        ----------
+        interval : float, optional
+            Time in seconds between two reads when there is nothing new.
+            The default is ``0.1``.
+        """
+        while True:
+            text = self.read()
+            if text:
+                yield from text.splitlines()
+            else:
+                time.sleep(interval)
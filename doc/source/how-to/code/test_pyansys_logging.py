@@ -1,12 +1,26 @@
 """Test for PyAnsys logging."""
 
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import gc
+import gzip
 import io
 import logging
+import multiprocessing
+import os
 from pathlib import Path
+import socket
+import subprocess
 import sys
+import threading
+import time
+import tracemalloc
 import weakref
 
+import bench_pyansys_logging
 import pyansys_logging
+import pytest
 
 
 def test_default_logger():
@@ -115,6 +129,1321 @@ def test_file_handlers(tmpdir):
     assert test_logger_ref() is None
 
 
+def test_asynchronous_file_handler(tmpdir):
+    """Write to a file from the background thread of the queue handler."""
+    file_logger = tmpdir.mkdir("sub").join("test_logger.txt")
+
+    test_logger = pyansys_logging.Logger(
+        to_file=True, to_stdout=False, filename=file_logger, asynchronous=True
+    )
+    assert test_logger.file_handler in test_logger.queue_handler.targets
+    assert test_logger.file_handler not in test_logger.logger.handlers
+
+    test_logger.info("Test async file")
+    listener = test_logger.queue_handler.listener
+    del test_logger  # Drains the queue on cleanup.
+
+    assert listener._thread is None
+    with Path.open(file_logger, "r") as f:
+        content = f.read()
+    assert (
+        "INFO -  - test_pyansys_logging - test_asynchronous_file_handler - Test async file"
+        in content
+    )
+
+
+def _overflow_messages(overflow):
+    """Log ten records through a queue of two records whose target is stuck on the first one."""
+    started = threading.Event()
+    release = threading.Event()
+    handled = []
+
+    class SlowHandler(logging.Handler):
+        """Handler blocked until the test releases it."""
+
+        def emit(self, record):
+            """Record the message once released."""
+            started.set()
+            release.wait()
+            handled.append(record.getMessage())
+
+    logger = logging.getLogger(f"test_overflow_{overflow}")
+    logger.propagate = False
+    queue_handler = pyansys_logging.PyAnsysQueueHandler(maxsize=2, overflow=overflow)
+    queue_handler.add_target(SlowHandler())
+    logger.addHandler(queue_handler)
+
+    logger.warning("0")
+    started.wait()
+    for i in range(1, 10):
+        logger.warning(str(i))
+    release.set()
+    queue_handler.close()
+    logger.removeHandler(queue_handler)
+    return handled, queue_handler.dropped
+
+
+def test_queue_overflow_drop_new():
+    """Discard the new records when the queue is full."""
+    handled, dropped = _overflow_messages("drop_new")
+    assert handled == ["0", "1", "2"]
+    assert dropped == 7
+
+
+def test_queue_overflow_drop_oldest():
+    """Discard the oldest queued records when the queue is full."""
+    handled, dropped = _overflow_messages("drop_oldest")
+    assert handled == ["0", "8", "9"]
+    assert dropped == 7
+
+
+def test_formatter_matches_standard_formatter():
+    """Produce the same output as ``logging.Formatter`` fed with a default instance name."""
+    formats = [
+        pyansys_logging.STDOUT_MSG_FORMAT,
+        "%(asctime)s [%(levelname)-8s] %(instance_name)s:%(lineno)04d 100%% %(message)s",
+        "%(message)r",
+    ]
+    try:
+        raise RuntimeError("Failure")
+    except RuntimeError:
+        exc_info = sys.exc_info()
+
+    for fmt in formats:
+        for instance_name in ("127.0.0.1:50052", None):
+            for record_exc_info in (None, exc_info):
+                record = logging.LogRecord(
+                    "pyproject_global", logging.INFO, __file__, 7, "Value %s", (3,), record_exc_info
+                )
+                reference = logging.makeLogRecord(record.__dict__)
+                reference.instance_name = instance_name or ""
+                if instance_name:
+                    record.instance_name = instance_name
+
+                expected = logging.Formatter(fmt).format(reference)
+                assert pyansys_logging.PyProjectFormatter(fmt).format(record) == expected
+
+
+def test_formatter_reuses_output():
+    """Format a record once for all the handlers sharing the same format."""
+    record = logging.LogRecord("pyproject_global", logging.INFO, __file__, 7, "Message", (), None)
+    record.instance_name = ""
+    stdout_formatter = pyansys_logging.PyProjectFormatter(pyansys_logging.STDOUT_MSG_FORMAT)
+    file_formatter = pyansys_logging.PyProjectFormatter(pyansys_logging.FILE_MSG_FORMAT)
+    other_formatter = pyansys_logging.PyProjectFormatter("%(message)s")
+
+    output = stdout_formatter.format(record)
+    assert file_formatter.format(record) is output
+    assert other_formatter.format(record) == "Message"
+
+    # The cache does not keep the record, nor the locals of its traceback, alive.
+    class Local:
+        pass
+
+    def fail():
+        local = Local()
+        weak_local.append(weakref.ref(local))
+        raise ValueError("Failed")
+
+    weak_local = []
+    try:
+        fail()
+    except ValueError:
+        record = logging.LogRecord(
+            "pyproject_global", logging.ERROR, __file__, 7, "Failed", (), sys.exc_info()
+        )
+    record.instance_name = ""
+    assert "ValueError: Failed" in stdout_formatter.format(record)
+    del record
+    gc.collect()
+    assert weak_local[0]() is None
+
+
+class ProductInstance:
+    """Product instance counting the calls to ``get_name``."""
+
+    def __init__(self, name):
+        self.name = name
+        self.get_name_calls = 0
+
+    def get_name(self):
+        """Return the name of the instance."""
+        self.get_name_calls += 1
+        return self.name
+
+
+def test_instance_logger_cached_name():
+    """Read the instance name once and again only when the instance is renamed."""
+    product = ProductInstance("127.0.0.1:50052")
+    capture = CaptureStdOut()
+    with capture:
+        test_logger = pyansys_logging.Logger()
+        instance_logger = test_logger.add_instance_logger("cached_name", product)
+        instance_logger.info("First message")
+        instance_logger.info("Second message")
+        product.name = "127.0.0.1:50053"
+        instance_logger.refresh_instance_name()
+        instance_logger.info("Renamed")
+
+    assert product.get_name_calls == 2
+    suffix = "test_pyansys_logging - test_instance_logger_cached_name"
+    assert f"INFO - 127.0.0.1:50052 - {suffix} - Second message" in capture.content
+    assert f"INFO - 127.0.0.1:50053 - {suffix} - Renamed" in capture.content
+
+
+def test_instance_logger_disabled_level_and_extra():
+    """Skip disabled levels without processing and merge caller ``extra`` fields."""
+    records = []
+
+    class ListHandler(logging.Handler):
+        """Handler keeping the records."""
+
+        def emit(self, record):
+            """Keep the record."""
+            records.append(record)
+
+    test_logger = pyansys_logging.Logger(to_stdout=False)
+    instance_logger = test_logger.add_instance_logger(
+        "disabled_level", ProductInstance("instance"), level="INFO"
+    )
+    instance_logger.logger.addHandler(ListHandler())
+    instance_logger.process = None  # Any processing would fail.
+    instance_logger.debug("Not processed %s", "at all")
+    del instance_logger.process
+
+    instance_logger.info("Processed", extra={"job": 3})
+    instance_logger.info("Processed again")
+
+    assert len(records) == 2
+    assert records[0].instance_name == records[1].instance_name == "instance"
+    assert records[0].job == 3
+    assert not hasattr(records[1], "job")
+    assert records[0].funcName == "test_instance_logger_disabled_level_and_extra"
+
+
+def test_instance_logger_names_and_release(tmpdir, monkeypatch):
+    """Give unique names to instance loggers and release them once collected."""
+    unraisable = []
+    monkeypatch.setattr(sys, "unraisablehook", unraisable.append)
+    test_logger = pyansys_logging.Logger(to_stdout=False)
+    product = ProductInstance("10.0.0.1:50052")
+    instance_loggers = [
+        test_logger.add_instance_logger("10.0.0.1:50052", product) for _ in range(100)
+    ]
+    names = [each.logger.name for each in instance_loggers]
+    assert names[:3] == ["10.0.0.1:50052", "10.0.0.1:50052_1", "10.0.0.1:50052_2"]
+    assert len(set(names)) == 100
+    assert test_logger["10.0.0.1:50052_99"] is instance_loggers[-1]
+
+    instance_loggers[0].log_to_file(str(tmpdir.join("instance.log")))
+    file_handler = instance_loggers[0].file_handler
+
+    del instance_loggers
+    gc.collect()
+
+    assert file_handler.stream is None  # Closed.
+    logger_dict = logging.root.manager.loggerDict
+    assert not any(name in logger_dict for name in names)
+    assert "10.0.0" not in logger_dict  # Placeholder of the dotted names.
+    assert not any(name in test_logger._instances for name in names)
+    assert "10.0.0.1:50052" not in test_logger._name_counters
+
+    # The name is free again.
+    assert test_logger.add_instance_logger("10.0.0.1:50052", product).logger.name == (
+        "10.0.0.1:50052"
+    )
+
+    # Without a name, each instance logger has its own logger.
+    unnamed = test_logger.add_instance_logger(None, product)
+    other = test_logger.add_instance_logger(None, product)
+    assert unnamed.logger.name == "NO_NAMED_YET"
+    assert other.logger.name == "NO_NAMED_YET_1"
+    del unnamed
+    gc.collect()
+    assert "NO_NAMED_YET" not in logger_dict
+    assert other.logger.handlers == [test_logger.shared_handler]
+    del other
+    gc.collect()
+    assert "NO_NAMED_YET_1" not in logger_dict
+    assert "NO_NAMED_YET" not in test_logger._name_counters
+    assert not unraisable
+
+
+def test_live_levels(tmpdir, monkeypatch):
+    """Follow the global level in constant time."""
+    file_logger = tmpdir.join("levels.log")
+    test_logger = pyansys_logging.Logger(
+        level=logging.INFO, to_file=True, to_stdout=False, filename=str(file_logger)
+    )
+    instance = test_logger.add_instance_logger("levels", ProductInstance("levels"))
+    child = test_logger.add_child_logger("levels_child")
+    verbose = test_logger.add_instance_logger("verbose", ProductInstance("verbose"), level="DEBUG")
+    assert not instance.logger.isEnabledFor(logging.DEBUG)
+    assert not child.isEnabledFor(logging.DEBUG)
+    assert verbose.logger.isEnabledFor(logging.DEBUG)
+    # Standard loggers below the global logger, created before and after
+    # the placeholder of their package is replaced.
+    module = logging.getLogger("pyproject_global.levels_package.module")
+    assert not module.isEnabledFor(logging.DEBUG)
+
+    def clear_cache():
+        raise AssertionError("The caches of all the loggers are cleared.")
+
+    monkeypatch.setattr(logging.root.manager, "_clear_cache", clear_cache)
+    test_logger.setLevel("DEBUG")
+    assert instance.logger.isEnabledFor(logging.DEBUG)
+    assert child.isEnabledFor(logging.DEBUG)
+    assert module.isEnabledFor(logging.DEBUG)
+    instance.debug("Following the global level")
+    package = logging.getLogger("pyproject_global.levels_package")
+    assert package.isEnabledFor(logging.DEBUG)
+
+    test_logger.setLevel("ERROR")
+    assert not package.isEnabledFor(logging.DEBUG)
+    assert not module.isEnabledFor(logging.DEBUG)
+    instance.setLevel("WARNING")
+    assert not child.isEnabledFor(logging.WARNING)
+    assert instance.logger.isEnabledFor(logging.WARNING)
+    assert verbose.logger.isEnabledFor(logging.DEBUG)
+    monkeypatch.undo()
+
+    # Levels added by name, and unknown names, as with ``logging.Logger``.
+    logging.addLevelName(25, "NOTICE")
+    instance.logger.setLevel("NOTICE")
+    assert instance.logger.isEnabledFor(25)
+    assert not instance.logger.isEnabledFor(logging.INFO)
+    with pytest.raises(ValueError, match="Unknown level"):
+        instance.logger.setLevel("UNKNOWN")
+
+    logging.disable(logging.CRITICAL)
+    try:
+        assert not verbose.logger.isEnabledFor(logging.ERROR)
+    finally:
+        logging.disable(logging.NOTSET)
+    assert verbose.logger.isEnabledFor(logging.ERROR)
+    assert "DEBUG - levels - " in file_logger.read()
+    del test_logger, instance, child, verbose
+
+
+def test_instance_loggers_share_handlers():
+    """Route all instance loggers to the same handlers with their own level."""
+    capture = CaptureStdOut()
+    with capture:
+        test_logger = pyansys_logging.Logger(level=logging.ERROR)
+        quiet = test_logger.add_instance_logger("quiet", ProductInstance("quiet"))
+        verbose = test_logger.add_instance_logger(
+            "verbose", ProductInstance("verbose"), level="DEBUG"
+        )
+        others = [
+            test_logger.add_instance_logger("other", ProductInstance("other")) for _ in range(50)
+        ]
+        child = test_logger.add_child_logger("child")
+        nested = test_logger.add_child_logger("child.nested", level="DEBUG")
+        # Records of the child loggers reach the root handlers, such as the
+        # ones of ``caplog``, once.
+        root_keeper = RecordKeeper()
+        logging.root.addHandler(root_keeper)
+        try:
+            quiet.debug("Quiet debug")
+            verbose.debug("Verbose debug")
+            child.error("Child error")
+            nested.debug("Nested debug")
+            nested.error("Nested error")
+        finally:
+            logging.root.removeHandler(root_keeper)
+
+    assert [each.getMessage() for each in root_keeper.records] == [
+        "Verbose debug",
+        "Child error",
+        "Nested debug",
+        "Nested error",
+    ]
+    shared_handlers = {
+        handler for each in [quiet, verbose, *others] for handler in each.logger.handlers
+    }
+    assert shared_handlers == {test_logger.shared_handler}
+    assert verbose.std_out_handler is test_logger.std_out_handler
+    assert "Quiet debug" not in capture.content
+    assert "DEBUG - verbose - test_pyansys_logging" in capture.content
+    assert capture.content.count("Child error") == 1
+    assert capture.content.count("Nested debug") == 1
+    assert capture.content.count("Nested error") == 1
+
+
+def test_rotating_file_handler(tmpdir):
+    """Rotate the file on size, compress the segments, and keep the last two."""
+    file_logger = tmpdir.join("rotating.log")
+    logger = logging.getLogger("test_rotating_file_handler")
+    logger.propagate = False
+    pyansys_logging.add_file_handler(
+        logger, filename=str(file_logger), write_headers=True, max_bytes=1000, backup_count=2
+    )
+    file_handler = logger.file_handler
+    for i in range(100):
+        logger.warning("Record %03d", i)
+    logger.removeHandler(file_handler)
+    file_handler.close()  # Waits for the compression.
+
+    segments = file_handler.rotated_segments()
+    assert len(segments) == 2
+    assert all(each.suffix == ".gz" for each in segments)
+    for path in [*segments, Path(file_logger)]:
+        opener = gzip.open if path.suffix == ".gz" else Path.open
+        with opener(path, "rt") as f:
+            content = f.read()
+        assert "NEW SESSION" in content.splitlines()[2]
+        assert "LEVEL - INSTANCE NAME - MODULE - FUNCTION - MESSAGE" in content
+        assert len(content) <= 1000
+
+    with gzip.open(segments[-1], "rt") as f:
+        assert "WARNING -  - test_pyansys_logging - test_rotating_file_handler - Record" in f.read()
+    with Path.open(file_logger, "r") as f:
+        assert "Record 099" in f.read()
+
+
+def test_structured_file_formats(tmpdir):
+    """Write JSON Lines and binary files and stream their records back."""
+    for file_format in ("jsonl", "binary"):
+        file_logger = tmpdir.join(f"structured.{file_format}")
+        test_logger = pyansys_logging.Logger(
+            to_file=True, to_stdout=False, filename=str(file_logger), file_format=file_format
+        )
+        first = test_logger.add_instance_logger("first", ProductInstance("first"))
+        second = test_logger.add_instance_logger("second", ProductInstance("second"))
+        first.debug("Debug - with separators")
+        first.error("Error %d", 1)
+        second.warning("Warning")
+        del test_logger, first, second
+
+        records = list(pyansys_logging.read_records(str(file_logger)))
+        assert [each["message"] for each in records] == [
+            "Debug - with separators",
+            "Error 1",
+            "Warning",
+            "Collecting logger",
+        ]
+        assert records[0]["level"] == "DEBUG"
+        assert records[0]["instance_name"] == "first"
+        assert records[0]["module"] == "test_pyansys_logging"
+        assert records[0]["funcName"] == "test_structured_file_formats"
+        assert isinstance(records[0]["timestamp"], float)
+
+        warnings = pyansys_logging.read_records(str(file_logger), level="WARNING")
+        assert [each["message"] for each in warnings] == ["Error 1", "Warning"]
+        first = pyansys_logging.read_records(str(file_logger), instance_name="first")
+        assert [each["message"] for each in first] == ["Debug - with separators", "Error 1"]
+
+
+def test_log_index(tmpdir):
+    """Index sessions and records while writing, and rebuild the index offline."""
+    for file_format in ("text", "jsonl"):
+        file_logger = tmpdir.join(f"indexed.{file_format}")
+        for session in range(2):
+            test_logger = pyansys_logging.Logger(
+                to_file=True,
+                to_stdout=False,
+                filename=str(file_logger),
+                file_format=file_format,
+                index=True,
+            )
+            instance = test_logger.add_instance_logger("first", ProductInstance("first"))
+            instance.info("Session %d", session)
+            try:
+                raise ValueError("Multi-line record")
+            except ValueError:
+                instance.exception("Failed in session %d", session)
+            test_logger.warning("Global warning")
+            del test_logger, instance
+
+        for rebuild in (False, True):
+            index = pyansys_logging.LogIndex(str(file_logger), rebuild=rebuild)
+            assert len(index.sessions()) == 2
+
+            records = list(index.records(session=-1))
+            assert len(records) == 4  # Including "Collecting logger".
+            assert "Session 1" in records[0]
+            assert "Traceback" in records[1]
+            assert "ValueError: Multi-line record" in records[1]
+
+            errors = list(index.records(level="ERROR"))
+            assert len(errors) == 2
+            instance_records = list(index.records(instance_name="first"))
+            assert len(instance_records) == 4
+            assert not list(index.records(instance_name="second"))
+
+    # Queued records are indexed with their creation time, not their write time.
+    handler = pyansys_logging.PyAnsysIndexedFileHandler(str(tmpdir.join("queued.log")))
+    created = time.time() - 3600
+    handler.handle(
+        logging.makeLogRecord({"msg": "Queued record", "levelno": logging.INFO, "created": created})
+    )
+    handler.handle(logging.makeLogRecord({"msg": "Recent record", "levelno": logging.INFO}))
+    late = {"msg": "Late record", "levelno": logging.INFO, "created": created + 1800}
+    handler.handle(logging.makeLogRecord(late))
+    handler.close()
+    index = pyansys_logging.LogIndex(str(tmpdir.join("queued.log")))
+    queued = list(index.records(end=datetime.fromtimestamp(created + 60)))
+    assert queued == ["Queued record"]
+    # Written after a newer record, the late one is still found from a start time.
+    assert list(index.records(start=datetime.fromtimestamp(created + 60))) == [
+        "Recent record",
+        "Late record",
+    ]
+    assert list(index.records(start=datetime.fromtimestamp(created + 3000))) == ["Recent record"]
+    index.close()
+
+
+def test_buffered_file_handler(tmpdir, monkeypatch):
+    """Write the records in batches by size, level, and time."""
+    fsyncs = []
+    monkeypatch.setattr(pyansys_logging.os, "fsync", fsyncs.append)
+    file_logger = tmpdir.join("buffered.log")
+    test_logger = pyansys_logging.Logger(to_file=False, to_stdout=False)
+    pyansys_logging.add_file_handler(
+        test_logger,
+        str(file_logger),
+        level=logging.DEBUG,
+        write_headers=True,
+        buffer_size=1000,
+        flush_interval=3600,
+        fsync="flush",
+    )
+    handler = test_logger.logger.handlers[-1]
+
+    test_logger.info("Buffered")
+    assert not file_logger.exists()  # Opened at the first write.
+    test_logger.error("Flushing")
+    assert "Buffered" in file_logger.read()
+    assert "Flushing" in file_logger.read()
+    assert len(fsyncs) == 1
+
+    for index in range(15):
+        test_logger.debug("Filling the buffer %d", index)
+    assert "Filling the buffer 0" in file_logger.read()
+    assert "Filling the buffer 14" not in file_logger.read()
+
+    handler.flush()
+    handler.flush_interval = 0.01
+    test_logger.debug("Written by the timer")
+    deadline = time.monotonic() + 5
+    while "Written by the timer" not in file_logger.read() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "Written by the timer" in file_logger.read()
+
+    handler.close()
+    test_logger.logger.removeHandler(handler)
+    assert fsyncs
+
+
+def test_rate_limit(tmpdir):
+    """Drop repeated records and summarize them."""
+    file_logger = tmpdir.join("rate_limit.log")
+    test_logger = pyansys_logging.Logger(to_file=True, to_stdout=False, filename=str(file_logger))
+    rate_limit = test_logger.add_rate_limit(rate=1e-6, burst=3, window=0.05)
+    first = test_logger.add_instance_logger("first", ProductInstance("first"))
+    second = test_logger.add_instance_logger("second", ProductInstance("second"))
+
+    for attempt in range(100):
+        first.warning("Connection lost, attempt %d", attempt)
+    second.warning("Connection lost, attempt %d", 0)
+    first.error("Connection lost, attempt %d", 100)
+    content = file_logger.read()
+    assert content.count("Connection lost") == 5
+    assert "attempt 2\n" in content
+    assert "attempt 3\n" not in content
+
+    time.sleep(0.06)
+    test_logger.info("Triggering the summaries")
+    content = file_logger.read()
+    assert "WARNING - first - " in content
+    assert "Connection lost, attempt 99 (repeated 97 times)" in content
+    assert content.count("repeated") == 1
+
+    for attempt in range(5):
+        first.warning("Connection lost, attempt %d", attempt)
+    rate_limit.flush()
+    assert "Connection lost, attempt 4 (repeated 5 times)" in file_logger.read()
+
+    # A flood followed by silence is summarized at the end of the window.
+    rate_limit.window = 0.2
+    rate_limit.flush()
+    for attempt in range(10):
+        second.error("Flooding, attempt %d", attempt)
+    deadline = time.monotonic() + 5
+    while "repeated 7 times" not in file_logger.read() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "Flooding, attempt 9 (repeated 7 times)" in file_logger.read()
+
+    with pytest.raises(ValueError, match="rate"):
+        pyansys_logging.RateLimitFilter(rate=0)
+
+
+def _log_from_worker(index):
+    """Log from a worker process with its own ``Logger``."""
+    worker_logger = pyansys_logging.Logger(to_file=True, to_stdout=False)
+    instance = worker_logger.add_instance_logger("worker", ProductInstance(f"worker_{index}"))
+    for record in range(50):
+        instance.info("Task %d, record %d", index, record)
+    del instance, worker_logger
+    return os.getpid()
+
+
+def _crash_in_worker(address):
+    """Log a record, then exit without cleaning up."""
+    pyansys_logging.worker_initializer(address)
+    worker_logger = pyansys_logging.Logger(to_stdout=False)
+    worker_logger.error("Crashing")
+    os._exit(1)
+
+
+def test_process_listener(tmpdir):
+    """Write the records of worker processes with the handlers of the parent."""
+    file_logger = tmpdir.join("processes.log")
+    test_logger = pyansys_logging.Logger(to_file=True, to_stdout=False, filename=str(file_logger))
+    listener = test_logger.start_process_listener()
+    # Forking this process, whose other threads can hold the locks of the
+    # standard streams, could leave the workers waiting for them.
+    context = multiprocessing.get_context("spawn")
+
+    crashing = context.Process(target=_crash_in_worker, args=listener.initargs)
+    crashing.start()
+    crashing.join()
+    assert crashing.exitcode == 1
+
+    # The connections of the workers of a pool are forgotten once they exit.
+    for tasks in (range(2), range(2, 4)):
+        with ProcessPoolExecutor(
+            max_workers=2,
+            mp_context=context,
+            initializer=pyansys_logging.worker_initializer,
+            initargs=listener.initargs,
+        ) as pool:
+            assert all(pool.map(_log_from_worker, tasks))
+    assert len(listener._connections) <= 3
+    listener.stop()
+
+    lines = file_logger.read().splitlines()
+    assert sum("NEW SESSION" in line for line in lines) == 1
+    assert sum("Crashing" in line for line in lines) == 1
+    for index in range(4):
+        records = [line for line in lines if f"- worker_{index} - " in line]
+        assert len(records) == 50
+        assert records[-1].endswith(f"Task {index}, record 49")
+    del test_logger
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork.")
+def test_fork(tmpdir, monkeypatch):
+    """Leave the records buffered, queued, and recorded in the parent to the parent."""
+    file_logger = tmpdir.join("fork.log")
+    buffered = tmpdir.join("fork_buffered.log")
+    test_logger = pyansys_logging.Logger(
+        level=logging.INFO,
+        to_file=True,
+        to_stdout=False,
+        filename=str(file_logger),
+        asynchronous=True,
+    )
+    monkeypatch.setattr(test_logger.logger, "propagate", False)
+    test_logger.add_flight_recorder(capacity=5)
+    pyansys_logging.add_file_handler(
+        test_logger, str(buffered), buffer_size=1_000_000, flush_interval=3600
+    )
+
+    # The listener thread is stuck on the first record, so the next ones stay queued.
+    test_logger.file_handler.acquire()
+    try:
+        test_logger.info("Parent record 0")
+        test_logger.debug("Parent step")
+        test_logger.info("Parent record 1")
+        pid = os.fork()
+        if pid == 0:
+            try:
+                test_logger.error("Child error")
+                test_logger.queue_handler.close()
+            finally:
+                os._exit(0)
+    finally:
+        test_logger.file_handler.release()
+    assert os.waitpid(pid, 0)[1] == 0
+
+    test_logger.error("Parent error")
+    del test_logger
+    for content in (file_logger.read(), buffered.read()):
+        for message in ("Parent record", "Parent step", "Child error", "Parent error"):
+            assert content.count(message) == (2 if message == "Parent record" else 1)
+    assert file_logger.read().count("Flight recorder") == 1
+
+
+def test_stats(tmpdir):
+    """Count the records and measure the handlers from several threads."""
+    file_logger = tmpdir.join("stats.log")
+    test_logger = pyansys_logging.Logger(
+        to_file=True, to_stdout=False, filename=str(file_logger), collect_stats=True
+    )
+    test_logger.add_rate_limit(rate=1e-6, burst=5, window=3600)
+    instance = test_logger.add_instance_logger("stats", ProductInstance("stats"))
+
+    def log_records(instance, global_logger):
+        for index in range(1000):
+            instance.info("Record %d", index)
+            global_logger.debug("Global record %d", index)
+
+    threads = [
+        threading.Thread(target=log_records, args=(instance, test_logger.logger)) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = test_logger.stats()
+    assert stats["records"][instance.logger.name]["INFO"] == {"emitted": 5, "filtered": 7995}
+    assert stats["records"]["pyproject_global"]["DEBUG"] == {"emitted": 5, "filtered": 7995}
+    assert stats["dropped"] == 0
+    # The counts of the threads that exited are kept once.
+    assert test_logger.stats()["records"] == stats["records"]
+    handler_stats = stats["handlers"][str(file_logger)]
+    assert handler_stats["format_seconds"] > 0
+    assert handler_stats["emit_seconds"] > 0
+
+    # The sizes are the ones of the encoded records, including in binary files.
+    test_logger.error("Température dépassée: 1200 °C")
+    headers = pyansys_logging.DEFAULT_FILE_HEADER + pyansys_logging.NEW_SESSION_HEADER
+    assert test_logger.stats()["handlers"][str(file_logger)]["bytes"] == file_logger.size() - len(
+        headers.encode()
+    )
+    binary_file = tmpdir.join("stats.bin")
+    binary_logger = pyansys_logging.Logger(
+        to_file=True,
+        to_stdout=False,
+        filename=str(binary_file),
+        file_format="binary",
+        collect_stats=True,
+    )
+    binary_logger.error("Température dépassée: 1200 °C")
+    binary_logger.info("Refroidissement")
+    session_frame = pyansys_logging._encode_frame(pyansys_logging._SESSION_FRAME, 0, 0.0)
+    assert binary_logger.stats()["handlers"][str(binary_file)]["bytes"] == binary_file.size() - len(
+        pyansys_logging.BINARY_MAGIC
+    ) - len(session_frame)
+    del test_logger, instance, binary_logger
+
+
+def test_latency_histogram():
+    """Bound the percentiles by the buckets."""
+    histogram = pyansys_logging.LatencyHistogram()
+    for duration in range(1, 1001):
+        histogram.record(duration * 1000)
+    summary = histogram.summary()
+    assert summary["count"] == 1000
+    assert summary["mean"] == 500500
+    assert summary["max"] == 1000000
+    for fraction in (0.5, 0.95, 0.99):
+        exact = fraction * 1000000
+        assert exact <= summary[f"p{round(fraction * 100)}"] <= exact * 1.25
+
+
+def test_spans(tmpdir, monkeypatch):
+    """Summarize the spans of the global and instance loggers."""
+    file_logger = tmpdir.join("spans.log")
+    test_logger = pyansys_logging.Logger(to_file=True, to_stdout=False, filename=str(file_logger))
+    instance = test_logger.add_instance_logger("spans", ProductInstance("spans"))
+
+    @instance.span("rpc")
+    def call(value):
+        return value
+
+    for value in range(10):
+        assert call(value) == value
+    with test_logger.span("solve"):
+        pass
+    assert not file_logger.exists()  # Nothing is logged yet.
+
+    test_logger.span_recorder.flush()
+    lines = [line for line in file_logger.read().splitlines() if "Span" in line]
+    assert len(lines) == 2
+    # Attributed to the measured function and to the ``with`` statement.
+    assert "INFO - spans - test_pyansys_logging - call - Span rpc: 10 calls, mean " in lines[0]
+    assert "INFO -  - test_pyansys_logging - test_spans - Span solve: 1 calls" in lines[1]
+
+    # The summaries are logged at the end of the interval without another span.
+    test_logger.span_recorder.interval = 0.2
+    test_logger.span_recorder.flush()
+    with test_logger.span("idle"):
+        pass
+    deadline = time.monotonic() + 5
+    while "Span idle" not in file_logger.read() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert "Span idle: 1 calls" in file_logger.read()
+
+    # A span entered again, in nested blocks or in other threads, measures each entry.
+    durations = []
+    monkeypatch.setattr(
+        test_logger.span_recorder, "record", lambda *args: durations.append(args[2] / 1e9)
+    )
+    span = test_logger.span("shared")
+
+    def sleep_in_span(seconds):
+        with span:
+            time.sleep(seconds)
+
+    with span:
+        sleep_in_span(0.05)
+        thread = threading.Thread(target=sleep_in_span, args=(0.1,))
+        thread.start()
+        sleep_in_span(0.02)
+        thread.join()
+    assert len(durations) == 4
+    assert all(0.02 <= duration < 0.1 for duration in durations[:2])
+    assert durations[2] >= 0.1  # The thread.
+    assert durations[3] >= 0.14  # The outer block, which waited for the thread.
+    del test_logger, instance
+
+
+def test_lazy_arguments(tmpdir, monkeypatch):
+    """Evaluate lazy arguments once, only when a handler writes the record."""
+    calls = []
+
+    def summary(name):
+        calls.append(name)
+        return f"{name} summary"
+
+    for asynchronous in (False, True):
+        file_logger = tmpdir.join(f"lazy_{asynchronous}.log")
+        test_logger = pyansys_logging.Logger(
+            level=logging.INFO,
+            to_file=True,
+            to_stdout=False,
+            filename=str(file_logger),
+            asynchronous=asynchronous,
+        )
+        # The capture handlers of pytest would format the records too.
+        monkeypatch.setattr(test_logger.logger, "propagate", False)
+        # A second handler formatting the same records.
+        test_logger.log_to_file(
+            str(file_logger) + ".jsonl", level=logging.INFO, file_format="jsonl"
+        )
+        instance = test_logger.add_instance_logger("lazy", ProductInstance("lazy"))
+        child = test_logger.add_child_logger("lazy_child")
+
+        instance.debug("Disabled %s", pyansys_logging.LazyArg(summary, "instance"))
+        # Enabled on the logger, but below the level of all the handlers.
+        test_logger.logger.setLevel(logging.DEBUG)
+        test_logger.debug("Filtered %s", pyansys_logging.LazyArg(summary, "global"))
+        assert calls == []
+
+        instance.info(
+            "Mesh: %s, %d nodes",
+            pyansys_logging.LazyArg(summary, "mesh"),
+            pyansys_logging.LazyArg(len, "nodes"),
+        )
+        child.info("Mesh: %r", pyansys_logging.LazyArg(summary, "child"))
+        mode = pyansys_logging.LazyArg(int, "755", 8)
+        instance.info("Flags: %x, mode: %o", mode, mode)
+        del test_logger, instance, child
+
+        assert calls == ["mesh", "child"]
+        assert "Flags: 1ed, mode: 755" in file_logger.read()
+        assert "Mesh: mesh summary, 5 nodes" in file_logger.read()
+        assert "Mesh: 'child summary'" in file_logger.read()
+        assert "Mesh: mesh summary, 5 nodes" in tmpdir.join(f"lazy_{asynchronous}.log.jsonl").read()
+        calls.clear()
+
+    # A slow argument does not delay the evaluation of the others.
+    started, release = threading.Event(), threading.Event()
+    slow = pyansys_logging.LazyArg(lambda: started.set() or release.wait(5))
+    thread = threading.Thread(target=lambda: slow.value)
+    thread.start()
+    started.wait()
+    pyansys_logging.LazyArg(release.set).value
+    thread.join()
+    assert slow.value is True
+
+
+def test_lazy_initialization(tmpdir):
+    """Open the files and start the threads at the first record only."""
+    imported = subprocess.run(
+        [sys.executable, "-c", "import sys, pyansys_logging; print('asyncio' in sys.modules)"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert imported.stdout.strip() == "False"
+
+    file_logger = tmpdir.join("lazy.log")
+    started = int(time.time())
+    test_logger = pyansys_logging.Logger(
+        to_file=True, to_stdout=False, filename=str(file_logger), asynchronous=True
+    )
+    assert not file_logger.exists()
+    assert test_logger.queue_handler.listener._thread is None
+
+    test_logger.info("First record")
+    test_logger.queue_handler.flush()
+    content = file_logger.read()
+    # The header has the time of the session, not the one of the import.
+    stamp = content.split("NEW SESSION - ", 1)[1].splitlines()[0]
+    assert time.mktime(time.strptime(stamp, "%m/%d/%Y, %H:%M:%S")) >= started
+    assert "First record" in content
+    del test_logger
+
+
+def test_mapped_segments(tmpdir):
+    """Copy the records into memory-mapped segments followed by a reader."""
+    file_logger = tmpdir.join("mapped.log")
+    test_logger = pyansys_logging.Logger(to_file=False, to_stdout=False)
+    pyansys_logging.add_file_handler(
+        test_logger, str(file_logger), write_headers=True, segment_size=4096
+    )
+    handler = test_logger.logger.handlers[-1]
+    reader = pyansys_logging.SegmentReader(str(file_logger))
+    assert reader.read() == ""
+
+    test_logger.info("First record")
+    first_segment = Path(str(file_logger) + ".000001")
+    assert first_segment.stat().st_size == 4096  # Preallocated.
+    text = reader.read()
+    assert "NEW SESSION" in text
+    assert text.endswith("First record\n")
+
+    # The reader follows the writer without locks and never sees a partial record.
+    lines = []
+
+    def follow():
+        for line in reader.follow(interval=0.001):
+            if "Record " in line:
+                lines.append(line)
+                if len(lines) == 500:
+                    return
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    for index in range(500):
+        test_logger.info("Record %d", index)
+    follower.join(10)
+    assert [line.rsplit(" ", 1)[1] for line in lines] == [str(index) for index in range(500)]
+    assert all(line.startswith("INFO -  - test_pyansys_logging - ") for line in lines)
+
+    handler.close()
+    test_logger.logger.removeHandler(handler)
+    segments = sorted(tmpdir.listdir("mapped.log.*"))
+    assert len(segments) > 5
+    # Full segments and the last one are truncated to their content.
+    assert all(segment.size() < 4096 for segment in segments)
+    assert reader.read() == ""
+    del test_logger
+
+
+class RecordKeeper(logging.Handler):
+    """Handler keeping the records it handles."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        """Keep the record."""
+        self.records.append(record)
+
+
+def test_compact_records(tmpdir, monkeypatch):
+    """Create compact records that format like the standard ones and use less memory."""
+    sizes = {}
+    for compact in (False, True):
+        file_logger = tmpdir.join(f"compact_{compact}.log")
+        test_logger = pyansys_logging.Logger(
+            to_file=True, to_stdout=False, filename=str(file_logger), compact_records=compact
+        )
+        monkeypatch.setattr(test_logger.logger, "propagate", False)
+        instance = test_logger.add_instance_logger("compact", ProductInstance("compact"))
+        keeper = RecordKeeper()
+        test_logger.logger.addHandler(keeper)
+
+        instance.debug("Step %d", 1)
+        test_logger.info("Global %(step)s", {"step": 2})
+        instance.info("Extra", extra={"user": "me"})
+        first, second, third = keeper.records
+        assert isinstance(first, pyansys_logging.CompactLogRecord) is compact
+        assert isinstance(second, pyansys_logging.CompactLogRecord) is compact
+        assert isinstance(third, logging.LogRecord)
+        standard = logging.Formatter("%(levelname)s %(name)s %(module)s:%(lineno)d %(message)s")
+        assert standard.format(first).startswith("DEBUG compact test_pyansys_logging:")
+        assert vars(second)["instance_name"] == ""
+        content = file_logger.read()
+        assert "DEBUG - compact - test_pyansys_logging - test_compact_records - Step 1" in content
+        assert "INFO -  - test_pyansys_logging - test_compact_records - Global 2" in content
+
+        keeper.records.clear()
+        tracemalloc.start()
+        for index in range(1000):
+            instance.debug("Step %d", index)
+        sizes[compact] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        test_logger.logger.removeHandler(keeper)
+        del test_logger, instance
+
+    assert sizes[True] < sizes[False] * 0.75
+
+
+def test_flight_recorder(tmpdir, monkeypatch):
+    """Write the last records filtered out by the handlers when an error is logged."""
+    monkeypatch.setattr(sys, "excepthook", sys.excepthook)
+    file_logger = tmpdir.join("flight.log")
+    test_logger = pyansys_logging.Logger(
+        level=logging.INFO, to_file=True, to_stdout=False, filename=str(file_logger)
+    )
+    monkeypatch.setattr(test_logger.logger, "propagate", False)
+    recorder = test_logger.add_flight_recorder(capacity=5)
+    instance = test_logger.add_instance_logger("flight", ProductInstance("flight"))
+    instance.add_flight_recorder(capacity=2)
+
+    for index in range(10):
+        test_logger.debug("Global step %d", index)
+    test_logger.info("Written")
+    for index in range(3):
+        instance.debug("Instance step %d", index)
+    assert "step" not in file_logger.read()
+    assert len(recorder._shared.slots) == 5
+
+    test_logger.error("Failed")
+    lines = file_logger.read().splitlines()
+    start = lines.index("INFO -  - test_pyansys_logging - test_flight_recorder - Written") + 1
+    assert lines[start].endswith("Flight recorder: last 4 records")
+    assert [line.rsplit(" - ", 1)[1] for line in lines[start + 1 : start + 6]] == [
+        "Global step 6",
+        "Global step 7",
+        "Global step 8",
+        "Global step 9",
+        "Failed",
+    ]
+
+    # The instance ring, with its own capacity, is written by the uncaught exception hook.
+    test_logger.setLevel(logging.INFO)
+    instance.debug("Still recorded")
+    sys.excepthook(ValueError, ValueError("Crash"), None)
+    content = file_logger.read()
+    assert "Instance step 0" not in content
+    assert "DEBUG - flight - test_pyansys_logging - test_flight_recorder - Instance step 2" in (
+        content
+    )
+    assert "Still recorded" in content
+    assert content.index("Still recorded") < content.index("Uncaught exception")
+    del test_logger, instance
+
+
+def server_log(data, size):
+    """Stand in for a product server sending its log in chunks of the given size."""
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def test_remote_ingestion(tmpdir, monkeypatch):
+    """Log a product log received in chunks splitting lines and characters."""
+    file_logger = tmpdir.join("remote.log")
+    test_logger = pyansys_logging.Logger(
+        level=logging.INFO, to_file=True, to_stdout=False, filename=str(file_logger)
+    )
+    monkeypatch.setattr(test_logger.logger, "propagate", False)
+    instance = test_logger.add_instance_logger("remote", ProductInstance("remote"))
+    keeper = RecordKeeper()
+    test_logger.logger.addHandler(keeper)
+    acquired = []
+    monkeypatch.setattr(
+        test_logger.file_handler, "acquire", lambda: acquired.append(time.perf_counter())
+    )
+    monkeypatch.setattr(test_logger.file_handler, "release", lambda: None)
+
+    data = (
+        "Solver 2024 R2\n"
+        "Error handling: strict\n"
+        "INFO: Mesh loaded in 2.5 s\r\n"
+        "debug mode enabled\n"
+        "[DEBUG] Not logged\n"
+        "WARNING - Température élevée\n"
+        "ERROR: Solve failed\n"
+        "Traceback:\n"
+        "  solver.c:42\n"
+        "\n"
+        "CRITICAL Stopped"
+    ).encode()
+    assert instance.ingest(server_log(data, 7)) == 5
+
+    assert [(record.levelno, record.getMessage()) for record in keeper.records] == [
+        (logging.INFO, "Solver 2024 R2\nError handling: strict"),
+        (logging.INFO, "Mesh loaded in 2.5 s\ndebug mode enabled"),
+        (logging.WARNING, "Température élevée"),
+        (logging.ERROR, "Solve failed\nTraceback:\n  solver.c:42"),
+        (logging.CRITICAL, "Stopped"),
+    ]
+    content = file_logger.read_text("utf-8")
+    assert "WARNING - remote - server -  - Température élevée" in content
+    assert "Not logged" not in content
+
+    # The records completed by the chunk are written in a single batch, then the last one.
+    monkeypatch.setattr(test_logger.file_handler, "flush", lambda: None)
+    acquired.clear()
+    assert instance.ingest([data + b"\n"]) == 5
+    assert len(acquired) == 2
+    assert test_logger.ingest([b"ERROR a\nb"], instance_name="other") == 1
+    # A long line in many chunks is joined once.
+    chunks = [b"INFO: ", *[b"x" * 50] * 20000, b"\n", *[b"y" * 50] * 20000]
+    records = [each for batch in pyansys_logging.parse_remote_log(chunks) for each in batch]
+    assert records == [(logging.INFO, "x" * 1000000 + "\n" + "y" * 1000000)]
+    assert keeper.records[-1].getMessage() == "a\nb"
+    assert keeper.records[-1].instance_name == "other"
+    test_logger.logger.removeHandler(keeper)
+    del test_logger, instance
+
+
+class Collector:
+    """Stand in for a log collector, keeping the batches it receives."""
+
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        self.server.bind(address)
+        self.server.listen()
+        self.address = self.server.getsockname()
+        self.connections = 0
+        self.batches = []
+        self.received = threading.Condition()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection):
+        with connection, connection.makefile("rb") as stream:
+            for batch in pyansys_logging.read_shipped_batches(stream):
+                with self.received:
+                    self.batches.append(batch)
+                    self.received.notify_all()
+
+    def messages(self, count):
+        """Wait for ``count`` records and return their messages."""
+        with self.received:
+            self.received.wait_for(lambda: sum(len(each) for _, each in self.batches) >= count, 5)
+        return [record["message"] for _, records in self.batches for record in records]
+
+    def close(self):
+        """Stop accepting connections."""
+        self.server.shutdown(socket.SHUT_RDWR)
+        self.server.close()
+
+
+def test_network_shipping(tmpdir):
+    """Ship batches over a pool of connections, and spill them while the collector is down."""
+    collector = Collector(("127.0.0.1", 0))
+    test_logger = pyansys_logging.Logger(to_stdout=False)
+    test_logger.log_to_network(collector.address, batch_size=1024, connections=2)
+    handler = test_logger.network_handler
+    instance = test_logger.add_instance_logger("shipped", ProductInstance("shipped"))
+    for index in range(1000):
+        instance.info("Shipped %d", index)
+    handler.close()
+    test_logger.logger.removeHandler(handler)
+    messages = collector.messages(1000)
+    assert sorted(messages) == sorted(f"Shipped {index}" for index in range(1000))
+    assert 10 < len(collector.batches) < 1000
+    assert collector.connections <= 2
+    collector.close()
+
+    # While nothing listens, the batches are spilled, then sent once the collector is up.
+    address = str(tmpdir.join("collector.sock"))
+    spill = tmpdir.join("spill.bin")
+    handler = pyansys_logging.PyAnsysNetworkHandler(
+        address, flush_level=logging.DEBUG, max_batches=1, spill_filename=str(spill), timeout=0.2
+    )
+    test_logger.logger.addHandler(handler)
+    for index in range(20):
+        test_logger.info("Spilled %d", index)
+    deadline = time.monotonic() + 5
+    while spill.size() == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert spill.size() > 0
+    collector = Collector(address)
+    test_logger.info("Collector up")
+    messages = collector.messages(21)
+    handler.close()
+    test_logger.logger.removeHandler(handler)
+    assert set(messages) == {f"Spilled {index}" for index in range(20)} | {"Collector up"}
+    assert spill.size() == 0
+    collector.close()
+
+    # The spilled batches are sent without the lock taken by the logging calls.
+    class Connection:
+        def __init__(self, failure):
+            self.sent = 0
+            self.failure = failure
+
+        def sendall(self, data):
+            assert not handler._spill_lock.locked()
+            if self.sent == self.failure:
+                raise OSError("Collector down")
+            self.sent += 1
+
+    for number in range(3):
+        handler._spill(pyansys_logging._SHIP_FRAME.pack(1, number, 0) + b"x")
+    with pytest.raises(OSError):
+        handler._send_spilled(Connection(failure=1))
+    # The batches not sent are kept.
+    assert spill.size() == 2 * (pyansys_logging._SHIP_FRAME.size + 1)
+    handler._send_spilled(Connection(failure=None))
+    assert spill.size() == 0
+
+    # One sender at a time sends the spilled batches, including the ones
+    # spilled while it sends.
+    class Sender(Connection):
+        def sendall(self, data):
+            super().sendall(data)
+            if self.sent == 1:
+                handler._spill(pyansys_logging._SHIP_FRAME.pack(1, 4, 0) + b"x")
+                other = Connection(failure=None)
+                handler._send_spilled(other)
+                assert other.sent == 0
+
+    handler._spill(pyansys_logging._SHIP_FRAME.pack(1, 3, 0) + b"x")
+    sender = Sender(failure=None)
+    handler._send_spilled(sender)
+    assert sender.sent == 2
+    assert spill.size() == 0
+    assert not Path(str(spill) + ".sending").exists()
+
+    # Without spill file, the callers wait at most the timeout for a free place.
+    handler = pyansys_logging.PyAnsysNetworkHandler(
+        str(tmpdir.join("down.sock")), flush_level=logging.DEBUG, max_batches=1, timeout=0.05
+    )
+    test_logger.logger.addHandler(handler)
+    start = time.monotonic()
+    for index in range(10):
+        test_logger.info("Dropped %d", index)
+    assert time.monotonic() - start < 2
+    handler.close()
+    test_logger.logger.removeHandler(handler)
+    assert handler.dropped_batches >= 5
+    del test_logger, instance
+
+
+def test_log_context(monkeypatch):
+    """Attribute the records of the global logger to the sessions of the current task."""
+    test_logger = pyansys_logging.Logger(to_stdout=False, compact_records=True)
+    monkeypatch.setattr(test_logger.logger, "propagate", False)
+    keeper = RecordKeeper()
+    test_logger.logger.addHandler(keeper)
+    instance = test_logger.add_instance_logger("adapter", ProductInstance("adapter"))
+
+    with pyansys_logging.log_context("first"):
+        test_logger.info("In first")
+        with pyansys_logging.log_context(session_id=7):
+            test_logger.info("In session")
+            instance.info("From adapter")
+    test_logger.info("Outside")
+    with pytest.raises(ValueError, match="msg"):
+        with pyansys_logging.log_context("wrong", msg="Overwritten"):
+            pass
+
+    info = test_logger.info
+
+    async def session(name):
+        with pyansys_logging.log_context(name):
+            for index in range(3):
+                info("Step %d", index)
+                await asyncio.sleep(0)
+
+    async def sessions():
+        await asyncio.gather(*(session(f"session {index}") for index in range(20)))
+
+    asyncio.run(sessions())
+    test_logger.logger.removeHandler(keeper)
+
+    records = keeper.records
+    assert [(each.getMessage(), each.instance_name) for each in records[:4]] == [
+        ("In first", "first"),
+        ("In session", "first"),
+        ("From adapter", "adapter"),
+        ("Outside", ""),
+    ]
+    # The records with other fields than the instance name cannot be compact.
+    assert isinstance(records[0], pyansys_logging.CompactLogRecord)
+    assert records[1].session_id == 7
+    assert records[2].session_id == 7
+    assert not hasattr(records[3], "session_id")
+    steps = records[4:]
+    assert len(steps) == 60
+    assert {each.instance_name for each in steps} == {f"session {index}" for index in range(20)}
+    assert all(
+        sum(each.instance_name == f"session {index}" for each in steps) == 3 for index in range(20)
+    )
+    del test_logger, instance
+
+
+def test_concurrency_stress():
+    """Log from threads and processes creating and releasing instance loggers."""
+    for processes in (0, 2):
+        result = bench_pyansys_logging.stress(threads=8, processes=processes, records=300)
+        assert bench_pyansys_logging.stress_errors(result) == {}
+
+
+class BlockedHandler(logging.Handler):
+    """Handler waiting for an event before handling each record."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        """Wait for the event, then store the message."""
+        self.released.wait()
+        self.messages.append(record.getMessage())
+
+
+def test_asyncio_logging(tmpdir):
+    """Log from coroutines without blocking, then drain and close the logger."""
+    file_logger = tmpdir.join("asyncio.log")
+    test_logger = pyansys_logging.Logger(
+        to_file=True, to_stdout=False, filename=str(file_logger), asynchronous=True
+    )
+    blocked = pyansys_logging.PyAnsysQueueHandler(maxsize=1)
+    blocked_target = BlockedHandler()
+    blocked.add_target(blocked_target)
+
+    async def main():
+        for index in range(10):
+            test_logger.info("Record %d", index)
+            await asyncio.sleep(0)
+        await test_logger.drain()
+        assert "Record 9" in file_logger.read()
+
+        # Records logged from the event loop are dropped instead of waiting.
+        test_logger.logger.addHandler(blocked)
+        try:
+            test_logger.info("Blocked")
+            while blocked.queue.qsize():
+                await asyncio.sleep(0.001)
+            test_logger.info("Queued")
+            test_logger.info("Dropped")
+            assert blocked.dropped == 1
+        finally:
+            test_logger.logger.removeHandler(blocked)
+            blocked_target.released.set()
+
+        await test_logger.aclose()
+        assert not test_logger.logger.handlers
+
+    asyncio.run(main())
+    blocked.close()
+    assert blocked_target.messages == ["Blocked", "Queued"]
+
+
 class CaptureStdOut:
     """Capture standard output with a context manager."""
 